@@ -1,12 +1,13 @@
 import logging
 import sys
+import threading
 from pathlib import Path
 
 # Project root on path
 PROJECT_ROOT = Path(__file__).resolve().parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
-# Checkpoint logging at INFO
+# Checkpoint logging at INFO (raw query / raw answer checkpoints are DEBUG)
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s %(name)s %(levelname)s %(message)s",
@@ -14,14 +15,30 @@ logging.basicConfig(
 )
 
 import streamlit as st
-from src.agent.agent import invoke, AgentResponse
+from src.agent.agent import invoke_stream, AgentResponse, get_agent as load_agent, warmup as warmup_agent
 
-# Warmup RAG (embedding model + Chroma) policy question is fast
-try:
-    from src.db import vector_store
-    vector_store.warmup()
-except Exception:
-    pass
+
+@st.cache_resource
+def get_agent():
+    """One (llm, tools, tool_map) per server process, shared across sessions and reruns.
+    Goes through agent.get_agent() so its lock also serializes the build with the warmup thread."""
+    return load_agent()
+
+
+@st.cache_resource
+def _start_warmup() -> None:
+    """Warmup once per process (not on every rerun)."""
+    # Warmup RAG (embedding model + Chroma) policy question is fast
+    try:
+        from src.db import vector_store
+        vector_store.warmup()
+    except Exception:
+        pass
+    # Warmup agent + LLM in the background so the UI renders immediately
+    threading.Thread(target=warmup_agent, daemon=True).start()
+
+
+_start_warmup()
 
 st.set_page_config(page_title="Data Loom", page_icon="🪢", layout="centered")
 
@@ -38,9 +55,19 @@ st.markdown('<p style="text-align:center; color:gray; margin-top:-0.5rem;">Ask a
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-def _render_query_details(d: dict) -> None:
-    """Single place to render query details expander content (avoids duplication)."""
+def _truncate(s: str | None, n: int) -> str | None:
+    """Display copy of s capped at n chars (computed once when the message is stored)."""
+    if s is None:
+        return None
+    return s[:n] + "..." if len(s) > n else s
+
+
+def _render_query_details(d: dict, i: int) -> None:
+    """Single place to render query details expander content (avoids duplication).
+    Body is only built once the user ticks the per-message checkbox, so collapsed history stays cheap on reruns."""
     with st.expander("Show query details", expanded=False):
+        if not st.checkbox("Load details", key=f"exp_{i}"):
+            return
         st.markdown("**Internal query**")
         st.text(d.get("internal_query") or "(same as user message)")
         st.markdown("**NLP analysis details**")
@@ -59,10 +86,11 @@ def _render_query_details(d: dict) -> None:
             st.code(d["sql_query"], language="sql")
         if d.get("sql_result") is not None:
             st.markdown("*SQL result*")
-            st.text(d["sql_result"][:3000] + ("..." if len(d.get("sql_result") or "") > 3000 else ""))
+            # Messages stored before the *_display keys existed fall back to truncating here
+            st.text(d.get("sql_result_display") or _truncate(d["sql_result"], 3000))
         if d.get("retrieval_used") and d.get("retrieval_snippet"):
             st.markdown("*Policy snippet*")
-            st.text(d["retrieval_snippet"][:2000] + ("..." if len(d.get("retrieval_snippet") or "") > 2000 else ""))
+            st.text(d.get("retrieval_snippet_display") or _truncate(d["retrieval_snippet"], 2000))
         if not d.get("sql_query") and not d.get("retrieval_used"):
             st.text("(No tool results for this message)")
 
@@ -82,7 +110,7 @@ for i, msg in enumerate(st.session_state.messages):
             if msg["role"] == "assistant" and isinstance(msg.get("content"), dict):
                 d = msg["content"]
                 st.markdown(d.get("answer", ""))
-                _render_query_details(d)
+                _render_query_details(d, i)
             else:
                 st.markdown(msg.get("content", ""))
 
@@ -92,11 +120,17 @@ if prompt := st.chat_input("Ask about a customer or policy..."):
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            try:
-                resp: AgentResponse = invoke(prompt)
-            except Exception as e:
-                resp = AgentResponse(answer=f"The assistant is temporarily unavailable: {e}")
+        placeholder = st.empty()
+        try:
+            # Intent + tools run before the first token; stream the answer after that
+            with st.spinner("Thinking..."):
+                stream = invoke_stream(prompt, agent=get_agent())
+                resp: AgentResponse = next(stream)
+            placeholder.markdown(resp.answer)
+            for resp in stream:
+                placeholder.markdown(resp.answer)
+        except Exception as e:
+            resp = AgentResponse(answer=f"The assistant is temporarily unavailable: {e}")
         d = {
             "answer": resp.answer,
             "sql_query": resp.sql_query,
@@ -107,8 +141,9 @@ if prompt := st.chat_input("Ask about a customer or policy..."):
             "nlp_details": resp.nlp_details,
             "agent_selection": resp.agent_selection,
             "raw_tool_output": resp.raw_tool_output,
+            "sql_result_display": _truncate(resp.sql_result, 3000),
+            "retrieval_snippet_display": _truncate(resp.retrieval_snippet, 2000),
         }
         st.session_state.messages.append({"role": "assistant", "content": d})
-        with _message_container(len(st.session_state.messages) - 1):
-            st.markdown(d["answer"])
-            _render_query_details(d)
+    # History loop renders the new turn; avoids rendering it twice
+    st.rerun()
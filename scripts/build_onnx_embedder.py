@@ -0,0 +1,16 @@
+"""Export and INT8-quantize all-MiniLM-L6-v2 to ONNX_MODEL_PATH (needs optimum[onnxruntime]). Then set EMBEDDING_ONNX=1 and re-ingest."""
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.db.onnx_embedder import build_quantized_model
+from src.config import ONNX_MODEL_PATH
+
+def main() -> None:
+    build_quantized_model(ONNX_MODEL_PATH)
+    print(f"Built INT8 ONNX embedder at {ONNX_MODEL_PATH}; set EMBEDDING_ONNX=1 and re-run scripts/ingest_policies.py")
+
+if __name__ == "__main__":
+    main()
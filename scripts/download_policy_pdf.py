@@ -1,4 +1,5 @@
 """Download refund policy PDF to data/policies/."""
+import hashlib
 import sys
 from pathlib import Path
 
@@ -8,14 +9,48 @@ POLICIES_DIR = PROJECT_ROOT / "data" / "policies"
 POLICIES_DIR.mkdir(parents=True, exist_ok=True)
 OUTPUT_PATH = POLICIES_DIR / "refund_policy.pdf"
 URL = "https://static.lightricks.com/legal/refund-policy.pdf"
+# SHA-256 of the known-good PDF; a matching local copy skips the download
+EXPECTED_SHA256 = "4fd14b22ae84a0ecc2c45d8c1b29bf2daa2337aafc0270f6cd68b9027373ed41"
+CHUNK_SIZE = 64 * 1024
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _session():
+    """requests session with exponential-backoff retry on transient errors."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    retry = Retry(total=5, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+    session.mount("https://", HTTPAdapter(max_retries=retry))
+    return session
 
 
 def main() -> None:
+    if OUTPUT_PATH.exists() and _sha256(OUTPUT_PATH) == EXPECTED_SHA256:
+        print(f"Already up to date: {OUTPUT_PATH}")
+        return
+    tmp_path = OUTPUT_PATH.with_suffix(".part")
     try:
-        import urllib.request
-        urllib.request.urlretrieve(URL, OUTPUT_PATH)
+        with _session().get(URL, stream=True, timeout=30) as r:
+            r.raise_for_status()
+            with open(tmp_path, "wb") as f:
+                for chunk in r.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+        tmp_path.replace(OUTPUT_PATH)
+        if _sha256(OUTPUT_PATH) != EXPECTED_SHA256:
+            print("Warning: downloaded PDF checksum differs from the expected one (policy may have changed).", file=sys.stderr)
         print(f"Downloaded to {OUTPUT_PATH}")
     except Exception as e:
+        tmp_path.unlink(missing_ok=True)
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
 
@@ -1,12 +1,15 @@
 """ReAct-style agent with intent-based routing. Policy -> retriever only; Customer -> SQL only; Both -> both."""
+import functools
+import json
 import logging
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Iterator, List, Optional
 
 from src.agent.intent import (
     INTENT_BOTH,
     INTENT_CUSTOMER,
-    INTENT_POLICY,
     classify_intent_and_entities,
     IntentResult,
 )
@@ -15,8 +18,9 @@ logger = logging.getLogger(__name__)
 
 CHECKPOINT = "checkpoint"
 
-def _log_checkpoint(name: str, data: Dict[str, Any]) -> None:
-    logger.info("[%s] %s: %s", CHECKPOINT, name, data)
+def _log_checkpoint(name: str, data: Dict[str, Any], level: int = logging.INFO) -> None:
+    """Coarse events at INFO; payload-heavy developer diagnostics at DEBUG (callers guard the payload build)."""
+    logger.log(level, "[%s] %s: %s", CHECKPOINT, name, data)
 
 
 @dataclass
@@ -62,21 +66,97 @@ Content rules:
 - Do not invent data. Be concise and clear."""
 
 
+# Caps on tool output embedded in the final-answer prompt (prefill cost grows with context)
+MAX_SQL_CONTEXT = 4000
+MAX_SQL_CONTEXT_ROWS = 20
+MAX_POLICY_CONTEXT = 3000
+
+
+def _bound_sql_context(sql_result: str) -> str:
+    """Keep the first whole rows of a JSON SQL result within MAX_SQL_CONTEXT chars for the LLM prompt,
+    noting how many of the matching rows were dropped; non-JSON results are just cut to length."""
+    from src.agent.tools import _TRUNCATION_NOTE_RE, _rows_json_prefix, _truncation_note
+
+    body, _, note = sql_result.partition("\n")
+    noted = _TRUNCATION_NOTE_RE.fullmatch(note)
+    if body.startswith("[") and body.endswith("]") and (noted or not note):
+        try:
+            rows = json.loads(body)
+        except ValueError:
+            rows = None
+        if isinstance(rows, list):
+            total = max(int(noted.group(1)) if noted else 0, len(rows))
+            budget = MAX_SQL_CONTEXT - len(_truncation_note(total, total)) - 1
+            text, shown = _rows_json_prefix(rows[:MAX_SQL_CONTEXT_ROWS], budget)
+            if shown < total:
+                return text + "\n" + _truncation_note(shown, total)
+            return text
+    return sql_result[:MAX_SQL_CONTEXT]
+
+
 def _parse_sql_tool_output(output: str) -> tuple[Optional[str], Optional[str]]:
     """Parse 'SQL: ... \\nResult: ...' from tool output."""
-    sql_query = None
-    sql_result = None
-    if "SQL:" in output and "Result:" in output:
-        parts = output.split("\nResult:", 1)
-        if len(parts) >= 1:
-            sql_query = parts[0].replace("SQL:", "").strip()
-        if len(parts) >= 2:
-            sql_result = parts[1].strip()
-    return sql_query, sql_result
+    head, sep, tail = output.partition("\nResult:")
+    if not head.startswith("SQL:"):
+        return None, None
+    return head.removeprefix("SQL:").strip(), (tail.strip() if sep else None)
+
+
+_agent_lock = threading.Lock()
+_tool_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="agent-tool")
+
+
+@dataclass
+class _SqlOutcome:
+    sql_query: Optional[str] = None
+    sql_result: Optional[str] = None
+    tool_outputs: List[str] = field(default_factory=list)
+
+
+@dataclass
+class _RetrievalOutcome:
+    used: bool = False
+    snippet: Optional[str] = None
+    tool_outputs: List[str] = field(default_factory=list)
+
+
+def _run_sql(tool_map: Dict[str, Any], raw_query: str, entities: Optional[dict] = None) -> _SqlOutcome:
+    """Call the SQL tool (with extracted entities for direct lookups) and parse its 'SQL: ... Result: ...' output."""
+    res = _SqlOutcome()
+    try:
+        args = {"question": raw_query, "entities": entities} if entities else {"question": raw_query}
+        out_str = str(tool_map["query_customer_tickets"].invoke(args))
+        res.tool_outputs.append("SQL tool: " + out_str[:500])
+        res.sql_query, res.sql_result = _parse_sql_tool_output(out_str)
+        _log_checkpoint("Query Generation", {"final_query_tool": "query_customer_tickets", "sql": res.sql_query})
+    except Exception as e:
+        err = str(e)
+        res.tool_outputs.append("SQL tool error: " + err)
+        res.sql_result = "Error: " + err
+        _log_checkpoint("Query Generation", {"error": err})
+    return res
+
 
+def _run_retriever(tool_map: Dict[str, Any], raw_query: str) -> _RetrievalOutcome:
+    """Call the policy retriever tool."""
+    res = _RetrievalOutcome()
+    try:
+        out = tool_map["search_policy_documents"].invoke({"query": raw_query})
+        out_str = str(out) if out else ""
+        res.used = True
+        res.snippet = out_str[:2000] or None
+        res.tool_outputs.append("Retriever: " + (out_str[:500] or "No results"))
+        _log_checkpoint("Query Generation", {"final_query_tool": "search_policy_documents"})
+    except Exception as e:
+        err = str(e)
+        res.tool_outputs.append("Retriever error: " + err)
+        res.snippet = "Error: " + err
+    return res
 
+
+@functools.lru_cache(maxsize=1)
 def build_agent():
-    """Build LLM and tools (for intent + tool execution)."""
+    """Build LLM and tools (for intent + tool execution). Cached: built once per process."""
     from langchain_ollama import ChatOllama
     from src.config import OLLAMA_BASE_URL, OLLAMA_MODEL, DB_PATH, CHROMA_PATH
     from src.agent.tools import create_sql_tool, create_retriever_tool
@@ -88,26 +168,49 @@ def build_agent():
     return llm, tools, {t.name: t for t in tools}
 
 
-def invoke(message: str) -> AgentResponse:
+def get_agent():
+    """Return the cached (llm, tools, tool_map); the lock keeps concurrent sessions from building twice."""
+    with _agent_lock:
+        return build_agent()
+
+
+def warmup() -> None:
+    """Build the agent and ping the LLM so the first query does not pay model-load latency.
+    The ping bypasses any global LLM cache: a cached answer would never make Ollama load the model."""
+    try:
+        llm, _, _ = get_agent()
+        llm.model_copy(update={"cache": False}).invoke("ok")
+    except Exception as e:
+        logger.debug("Agent warmup skipped or failed: %s", e)
+
+
+def reset_agent_cache() -> None:
+    """Drop the cached agent so the next call rebuilds it (used by tests)."""
+    with _agent_lock:
+        build_agent.cache_clear()
+
+
+def _prepare_turn(message: str, agent: Optional[tuple]) -> tuple[Any, List[Any], AgentResponse]:
     """
-    Run intent classification, route to correct tool(s) only, then generate final answer.
-    No policy questions to SQL; no customer-only questions to retriever.
+    Classify, run the routed tool(s) and build the final-answer prompt.
+    Returns (llm, messages, response-without-answer); llm is None when there is nothing to ask.
     """
     from langchain_core.messages import HumanMessage, SystemMessage
 
     raw_query = (message or "").strip()
     _log_checkpoint("User Input Received", {"message_length": len(raw_query)})
-    _log_checkpoint("Raw User Query", {"query": raw_query})
+    if logger.isEnabledFor(logging.DEBUG):
+        _log_checkpoint("Raw User Query", {"query": raw_query}, level=logging.DEBUG)
 
     if not raw_query:
-        return AgentResponse(
+        return None, [], AgentResponse(
             answer="Please provide a question about a customer, support tickets, or company policy.",
             internal_query=raw_query,
             nlp_details={"intent": "none", "confidence": 0, "entities": {}},
             agent_selection="none",
         )
 
-    llm, tools, tool_map = build_agent()
+    llm, tools, tool_map = agent or get_agent()
     intent_result: IntentResult = classify_intent_and_entities(raw_query, llm=llm)
 
     _log_checkpoint("Intent Classification Result", {
@@ -133,44 +236,29 @@ def invoke(message: str) -> AgentResponse:
         "reason": "Intent-based routing: " + intent_result.intent,
     })
 
-    sql_query: Optional[str] = None
-    sql_result: Optional[str] = None
-    retrieval_used = False
-    retrieval_snippet: Optional[str] = None
-    tool_outputs: List[str] = []
+    sql = _SqlOutcome()
+    retrieval = _RetrievalOutcome()
+    if intent_result.intent == INTENT_BOTH:
+        # Independent I/O-bound tools: run side by side
+        sql_future = _tool_executor.submit(_run_sql, tool_map, raw_query, entities)
+        retrieval_future = _tool_executor.submit(_run_retriever, tool_map, raw_query)
+        wait([sql_future, retrieval_future])
+        sql, retrieval = sql_future.result(), retrieval_future.result()
+    elif intent_result.intent == INTENT_CUSTOMER:
+        sql = _run_sql(tool_map, raw_query, entities)
+    else:
+        retrieval = _run_retriever(tool_map, raw_query)
 
-    if intent_result.intent in (INTENT_CUSTOMER, INTENT_BOTH):
-        try:
-            out = tool_map["query_customer_tickets"].invoke({"question": raw_query})
-            tool_outputs.append("SQL tool: " + str(out)[:500])
-            sq, sr = _parse_sql_tool_output(str(out))
-            if sq is not None:
-                sql_query = sq
-            if sr is not None:
-                sql_result = sr
-            _log_checkpoint("Query Generation", {"final_query_tool": "query_customer_tickets", "sql": sql_query})
-        except Exception as e:
-            tool_outputs.append("SQL tool error: " + str(e))
-            sql_result = "Error: " + str(e)
-            _log_checkpoint("Query Generation", {"error": str(e)})
-
-    if intent_result.intent in (INTENT_POLICY, INTENT_BOTH):
-        try:
-            out = tool_map["search_policy_documents"].invoke({"query": raw_query})
-            retrieval_used = True
-            retrieval_snippet = str(out)[:2000] if out else None
-            tool_outputs.append("Retriever: " + (str(out)[:500] if out else "No results"))
-            _log_checkpoint("Query Generation", {"final_query_tool": "search_policy_documents"})
-        except Exception as e:
-            tool_outputs.append("Retriever error: " + str(e))
-            retrieval_snippet = "Error: " + str(e)
+    sql_query, sql_result = sql.sql_query, sql.sql_result
+    retrieval_used, retrieval_snippet = retrieval.used, retrieval.snippet
+    tool_outputs: List[str] = sql.tool_outputs + retrieval.tool_outputs
 
     # Build context for final answer
     context_parts = []
     if sql_result is not None:
-        context_parts.append("Customer/ticket data:\n" + sql_result)
+        context_parts.append("Customer/ticket data:\n" + _bound_sql_context(sql_result))
     if retrieval_snippet:
-        context_parts.append("Policy/relevant documents:\n" + retrieval_snippet)
+        context_parts.append("Policy/relevant documents:\n" + retrieval_snippet[:MAX_POLICY_CONTEXT])
     if not context_parts:
         context_parts.append("No data was retrieved. Tell the user no matching data was found and do not invent any information.")
 
@@ -179,37 +267,70 @@ def invoke(message: str) -> AgentResponse:
         SystemMessage(content=FINAL_ANSWER_SYSTEM),
         HumanMessage(content=f"Context:\n{context}\n\nUser question: {raw_query}\n\nAnswer in natural language with clear structure. For customer/ticket data, use Profile and Tickets sections as in the instructions. For policy questions, answer in plain language. For 'qualify under refund policy', combine customer data and policy and state whether they qualify."),
     ]
-    try:
-        response = llm.invoke(messages)
-        raw_answer = response.content if hasattr(response, "content") else str(response)
-        _log_checkpoint("Agent Response", {"raw_output": raw_answer[:500] if raw_answer else ""})
-    except Exception as e:
-        raw_answer = f"I couldn't complete the request: {e}"
-        logger.exception("LLM final answer failed")
-        _log_checkpoint("Agent Response", {"error": str(e)})
 
     nlp_details = {
         "intent": intent_result.intent,
         "confidence": intent_result.confidence,
         "entities": entities,
     }
-    agent_selection = ", ".join(selected_tools)
-    payload = {
-        "answer": raw_answer,
-        "internal_query": raw_query,
-        "nlp_details": nlp_details,
-        "agent_selection": agent_selection,
-    }
-    _log_checkpoint("UI Payload", {"answer_length": len(raw_answer), "has_sql": sql_query is not None, "has_retrieval": retrieval_used})
-
-    return AgentResponse(
-        answer=raw_answer or "I couldn't generate a response.",
+    return llm, messages, AgentResponse(
+        answer="",
         sql_query=sql_query,
         sql_result=sql_result,
         retrieval_used=retrieval_used,
-        retrieval_snippet=retrieval_snippet[:2000] if retrieval_snippet else None,
+        retrieval_snippet=retrieval_snippet or None,
         internal_query=raw_query,
         nlp_details=nlp_details,
-        agent_selection=agent_selection,
+        agent_selection=", ".join(selected_tools),
         raw_tool_output=" | ".join(tool_outputs) if tool_outputs else None,
     )
+
+
+def _finish_turn(response: AgentResponse, raw_answer: str) -> AgentResponse:
+    """Attach the final answer to a prepared response."""
+    _log_checkpoint("UI Payload", {"answer_length": len(raw_answer), "has_sql": response.sql_query is not None, "has_retrieval": response.retrieval_used})
+    return replace(response, answer=raw_answer or "I couldn't generate a response.")
+
+
+def invoke(message: str, agent: Optional[tuple] = None) -> AgentResponse:
+    """
+    Run intent classification, route to correct tool(s) only, then generate final answer.
+    No policy questions to SQL; no customer-only questions to retriever.
+    agent: optional (llm, tools, tool_map) from build_agent(), e.g. a UI-cached instance.
+    """
+    llm, messages, prepared = _prepare_turn(message, agent)
+    if llm is None:
+        return prepared
+    try:
+        response = llm.invoke(messages)
+        raw_answer = response.content if hasattr(response, "content") else str(response)
+        if logger.isEnabledFor(logging.DEBUG):
+            _log_checkpoint("Agent Response", {"raw_output": raw_answer[:500] if raw_answer else ""}, level=logging.DEBUG)
+    except Exception as e:
+        raw_answer = f"I couldn't complete the request: {e}"
+        logger.exception("LLM final answer failed")
+        _log_checkpoint("Agent Response", {"error": str(e)})
+    return _finish_turn(prepared, raw_answer)
+
+
+def invoke_stream(message: str, agent: Optional[tuple] = None) -> Iterator[AgentResponse]:
+    """
+    Same as invoke(), but streams the final answer: yields AgentResponse snapshots whose answer
+    grows as tokens arrive. The last item yielded is the complete response.
+    """
+    llm, messages, prepared = _prepare_turn(message, agent)
+    if llm is None:
+        yield prepared
+        return
+    raw_answer = ""
+    try:
+        for chunk in llm.stream(messages):
+            raw_answer += chunk.content if hasattr(chunk, "content") else str(chunk)
+            yield replace(prepared, answer=raw_answer)
+        if logger.isEnabledFor(logging.DEBUG):
+            _log_checkpoint("Agent Response", {"raw_output": raw_answer[:500]}, level=logging.DEBUG)
+    except Exception as e:
+        raw_answer = f"I couldn't complete the request: {e}"
+        logger.exception("LLM final answer failed")
+        _log_checkpoint("Agent Response", {"error": str(e)})
+    yield _finish_turn(prepared, raw_answer)
@@ -1,10 +1,13 @@
 """Intent classification and entity extraction. Routes policy vs customer queries."""
+import functools
 import json
 import logging
 import re
 from dataclasses import dataclass
 from typing import Any, Optional
 
+from src.agent.name_index import find_customer_name
+
 logger = logging.getLogger(__name__)
 
 INTENT_POLICY = "policy"
@@ -12,6 +15,65 @@ INTENT_CUSTOMER = "customer"
 INTENT_BOTH = "both"
 
 
+# Latest LLM seen by classify_intent_and_entities per model config (the cache key); one slot per config
+_llms_by_key: dict[tuple, Any] = {}
+
+
+class _UncachedResult(Exception):
+    """Raised inside _classify_cached to return a result without lru_cache storing it."""
+
+    def __init__(self, result: "IntentResult"):
+        self.result = result
+
+
+def _llm_key(llm) -> tuple:
+    """Stable cache key: LLM class + model config, so equivalent LLM objects (temperature=0) share one entry."""
+    cls = type(llm)
+    return (cls.__module__, cls.__qualname__, getattr(llm, "model", None),
+            getattr(llm, "base_url", None), getattr(llm, "temperature", None))
+
+# Name / entity patterns (compiled once; helpers run several times per message)
+_PAT_CUSTOMER_PREFIX = re.compile(r"\bcustomer\s+([A-Z][a-z]+\s+[A-Z][a-z]+)")
+_PAT_DOES_DID = re.compile(r"(?:Does|Did|Has)\s+([A-Z][a-z]+\s+[A-Z][a-z]+)\s+")
+_PAT_CUSTOMER_NAME = re.compile(r"\bcustomer\s+([A-Za-z][A-Za-z\s]+?)(?:\'s|\s+profile|\s+details|$)", re.I | re.DOTALL)
+_PAT_TWO_WORD_NAME = re.compile(r"([A-Z][a-z]+\s+[A-Z][a-z]+)(?:\s+profile|\s+details|\s+qualify|\s+buy)?")
+# Email, product, ticket id and status in one pass (name patterns above stay separate: they are case-sensitive).
+# product is captured inside a lookahead so the product text doesn't hide a ticket id / status that follows it.
+_ENTITY_RE = re.compile(r"""
+    (?P<email>[\w.+%-]+@[\w.-]+\.\w+)
+  | ticket\s*(?:id)?\s*[\#:]?\s*(?P<ticket_id>[A-Z]?\d+)
+  | \b(?P<status>open|pending|resolved|closed|in\ progress)\b
+  | \b(?=(?:buy|bought|purchase|product)\s+['"]?(?P<product>[A-Za-z0-9][A-Za-z0-9\s]*?)['"]?(?:[?.,]|$))
+""", re.I | re.X)
+_ENTITY_KEYS = {"email": "customer_email", "ticket_id": "ticket_id", "status": "ticket_status", "product": "product_purchased"}
+
+# Heuristics for policy-only
+_POLICY_KEYWORDS = (
+    "refund policy", "refund policy?", "current refund", "what is the refund",
+    "policy", "terms", "cancellation", "qualify under", "qualify for refund",
+    "policy document", "legal", "company policy",
+)
+# Customer/ticket keywords
+_CUSTOMER_KEYWORDS = (
+    "customer", "profile", "support ticket", "ticket details", "ticket history",
+    "overview of customer", "customer's profile", "past support", "tickets for",
+)
+_KEYWORD_BUCKET = {
+    **{k: "policy" for k in _POLICY_KEYWORDS},
+    **{k: "customer" for k in _CUSTOMER_KEYWORDS},
+}
+# One left-to-right pass over the message; the zero-width lookahead also reports overlapping keywords
+_KEYWORD_RE = re.compile(
+    "(?=(" + "|".join(re.escape(k) for k in sorted(_KEYWORD_BUCKET, key=len, reverse=True)) + "))"
+)
+
+# Fast-path patterns: obvious phrasings are classified without an LLM round-trip
+_POLICY_RE = re.compile(r"\b(?:refunds?|polic(?:y|ies)|terms|warranty|returns?)\b", re.I)
+# (ticket ids and "customer ..." never get here: entity extraction / keywords route them first)
+_CUSTOMER_RE = re.compile(r"\bemail\b", re.I)
+_BOTH_RE = re.compile(r"\b(?:qualif(?:y|ies)|eligib(?:le|ility))\b", re.I)
+
+
 @dataclass
 class IntentResult:
     intent: str  # "policy" | "customer" | "both"
@@ -22,34 +84,36 @@ class IntentResult:
     entities: Optional[dict] = None  # email, product, ticket_status, etc.
 
 
-def _has_person_name(text: str) -> bool:
-    """True if message contains a person name (e.g. 'Denise Lee') even without the word 'customer'."""
-    # Two capitalized words (First Last) or name after "customer"
-    if re.search(r"\bcustomer\s+([A-Z][a-z]+\s+[A-Z][a-z]+)", text):
-        return True
-    if re.search(r"\b([A-Z][a-z]+\s+[A-Z][a-z]+)\s+(?:qualify|profile|details|tickets|bought|purchased)", text):
-        return True
-    if re.search(r"(?:Does|Did|Has)\s+([A-Z][a-z]+\s+[A-Z][a-z]+)\s+", text):
-        return True
-    return False
+def _keyword_buckets(msg_lower: str) -> set[str]:
+    """Buckets ('policy' / 'customer') whose keywords occur in the lowercased message."""
+    buckets = set()
+    for m in _KEYWORD_RE.finditer(msg_lower):
+        buckets.add(_KEYWORD_BUCKET[m.group(1)])
+        if len(buckets) == 2:
+            break
+    return buckets
 
 
 def _extract_customer_name_from_text(text: str) -> Optional[str]:
     """Extract customer name: e.g. 'customer Denise Lee' or 'Denise Lee qualify'."""
+    # Known customers from the DB first (one Aho-Corasick pass); regexes below are the fallback
+    known = find_customer_name(text)
+    if known:
+        return known
     # "customer Denise Lee" or "customer Denise Lee's profile" or "customer Denise Lee profile"
-    m = re.search(r"\bcustomer\s+([A-Za-z][A-Za-z\s]+?)(?:\'s|\s+profile|\s+details|$)", text, re.I | re.DOTALL)
+    m = _PAT_CUSTOMER_NAME.search(text)
     if m:
         return m.group(1).strip()
     # "Does Denise Lee qualify" or "Did Denise Lee buy"
-    m = re.search(r"(?:Does|Did|Has)\s+([A-Z][a-z]+\s+[A-Z][a-z]+)\s+", text)
+    m = _PAT_DOES_DID.search(text)
     if m:
         return m.group(1).strip()
     # "overview of customer Denise Lee" - two-word name after "customer"
-    m = re.search(r"\bcustomer\s+([A-Z][a-z]+\s+[A-Z][a-z]+)", text)
+    m = _PAT_CUSTOMER_PREFIX.search(text)
     if m:
         return m.group(1).strip()
     # "Denise Lee profile" or "Denise Lee qualify" without "customer" before
-    m = re.search(r"([A-Z][a-z]+\s+[A-Z][a-z]+)(?:\s+profile|\s+details|\s+qualify|\s+buy)?", text)
+    m = _PAT_TWO_WORD_NAME.search(text)
     if m:
         return m.group(1).strip()
     return None
@@ -61,60 +125,81 @@ def _extract_entities(text: str) -> dict:
     name = _extract_customer_name_from_text(text)
     if name:
         entities["customer_name"] = name
-    # Email
-    m = re.search(r"[\w.+%-]+@[\w.-]+\.\w+", text)
-    if m:
-        entities["customer_email"] = m.group(0)
-    # Product (e.g. "Philips Light", "Philips Hue Lights", "Did Denise Lee buy Philips Light")
-    m = re.search(r"(?:buy|bought|purchase|product)\s+[\'\"]?([A-Za-z0-9\s]+?)[\'\"]?(?:\?|\.|,|$)", text, re.I)
-    if m:
-        entities["product_purchased"] = m.group(1).strip()
-    # Alternative: "X buy Y" -> product Y
-    m = re.search(r"\b(?:buy|bought)\s+([A-Za-z0-9][A-Za-z0-9\s]*?)(?:\?|\.|$)", text, re.I)
-    if m and "product" not in entities:
-        entities["product_purchased"] = m.group(1).strip()
-    # Ticket ID (e.g. T001, ticket 123)
-    m = re.search(r"ticket\s*(?:id)?\s*[#:]?\s*([A-Z]?\d+)", text, re.I)
-    if m:
-        entities["ticket_id"] = m.group(1)
-    # Ticket status
-    for status in ("open", "pending", "resolved", "closed", "in progress"):
-        if re.search(rf"\b{status}\b", text, re.I):
-            entities["ticket_status"] = status
-            break
+    # Email, product, ticket ID (e.g. T001, ticket 123), status: first match of each, one scan
+    for m in _ENTITY_RE.finditer(text):
+        group = m.lastgroup
+        key = _ENTITY_KEYS[group]
+        if key not in entities:
+            value = m.group(group).strip()
+            entities[key] = value.lower() if group == "status" else value
     return entities
 
 
+def _fast_path_intent(message: str, entities: dict) -> Optional[IntentResult]:
+    """Regex intent for obvious phrasings (warranty, ticket #123, email, eligible...). None when ambiguous."""
+    has_policy = _POLICY_RE.search(message) is not None
+    # "email" alone ("What is the support email?") is not a customer lookup; it needs an extracted address
+    has_customer = bool(entities.get("customer_email")) and _CUSTOMER_RE.search(message) is not None
+    if has_customer and _BOTH_RE.search(message):
+        intent = INTENT_BOTH
+    elif has_policy and not has_customer:
+        intent = INTENT_POLICY
+    elif has_customer and not has_policy:
+        intent = INTENT_CUSTOMER
+    else:
+        return None
+    if intent == INTENT_POLICY:
+        return IntentResult(
+            intent=intent,
+            confidence=0.9,
+            entities={},
+            raw_json=json.dumps({"intent": intent, "confidence": 0.9}),
+        )
+    name = entities.get("customer_name")
+    return IntentResult(
+        intent=intent,
+        confidence=0.9,
+        customer_name=name,
+        ticket_id=entities.get("ticket_id"),
+        entities=entities or None,
+        raw_json=json.dumps({"intent": intent, "customer_name": name, "confidence": 0.9}),
+    )
+
+
 def classify_intent_and_entities(user_message: str, llm=None) -> IntentResult:
     """
     Classify intent (policy / customer / both) and extract entities.
-    Uses LLM when available; falls back to rules.
+    Keyword rules first, then a regex fast path; LLM only for what is still ambiguous.
+    Memoized per (whitespace-normalized message, llm): the returned IntentResult is shared, do not mutate it.
     """
-    message = (user_message or "").strip()
+    message = " ".join((user_message or "").split())
     if not message:
         return IntentResult(intent=INTENT_BOTH, confidence=0.0)
+    llm_key = None
+    if llm is not None:
+        # LLM objects are not hashable: key the cache on the model config and keep the latest object here
+        llm_key = _llm_key(llm)
+        _llms_by_key[llm_key] = llm
+    try:
+        return _classify_cached(message, llm_key)
+    except _UncachedResult as e:
+        return e.result
 
-    # Heuristics for policy-only
-    policy_keywords = [
-        "refund policy", "refund policy?", "current refund", "what is the refund",
-        "policy", "terms", "cancellation", "qualify under", "qualify for refund",
-        "policy document", "legal", "company policy"
-    ]
-    # Customer/ticket keywords
-    customer_keywords = [
-        "customer", "profile", "support ticket", "ticket details", "ticket history",
-        "overview of customer", "customer's profile", "past support", "tickets for"
-    ]
-
-    msg_lower = message.lower()
-    has_policy = any(k in msg_lower for k in policy_keywords) or "policy" in msg_lower
-    has_customer = any(k in msg_lower for k in customer_keywords) or "customer" in msg_lower
-    has_person_or_entity = _has_person_name(message) or bool(_extract_entities(message))
+
+@functools.lru_cache(maxsize=1024)
+def _classify_cached(message: str, llm_key: Optional[tuple]) -> IntentResult:
+    llm = _llms_by_key.get(llm_key) if llm_key is not None else None
+    buckets = _keyword_buckets(message.lower())
+    has_policy = "policy" in buckets
+    has_customer = "customer" in buckets
+    # Entities (incl. customer name) once per message; every branch below reuses them.
+    # Any person-name match (e.g. 'Does Denise Lee ...') also yields customer_name, so entities covers it.
+    entities = _extract_entities(message)
+    name = entities.get("customer_name")
+    has_person_or_entity = bool(entities)
 
     # "Does Denise Lee qualify under refund policy?" -> both (person name + policy, even without word "customer")
     if has_policy and (has_customer or has_person_or_entity):
-        entities = _extract_entities(message)
-        name = entities.get("customer_name") or _extract_customer_name_from_text(message)
         return IntentResult(
             intent=INTENT_BOTH,
             confidence=0.9,
@@ -133,20 +218,26 @@ def classify_intent_and_entities(user_message: str, llm=None) -> IntentResult:
             raw_json=json.dumps({"intent": INTENT_POLICY, "confidence": 0.95})
         )
     
-    # Customer/ticket only (name, email, product, ticket, etc.)
+    # Customer/ticket (name, email, product, ticket, etc.); eligibility questions also need the policy
+    # ("Is customer Denise Lee eligible for a refund?", "Is ticket #42 eligible for a return?")
     if has_customer or has_person_or_entity:
-        entities = _extract_entities(message)
-        name = entities.get("customer_name") or _extract_customer_name_from_text(message)
+        intent = INTENT_BOTH if _BOTH_RE.search(message) else INTENT_CUSTOMER
         return IntentResult(
-            intent=INTENT_CUSTOMER,
+            intent=intent,
             confidence=0.9,
             customer_name=name,
             ticket_id=entities.get("ticket_id"),
             entities=entities or None,
-            raw_json=json.dumps({"intent": INTENT_CUSTOMER, "customer_name": name, "confidence": 0.9})
+            raw_json=json.dumps({"intent": intent, "customer_name": name, "confidence": 0.9})
         )
 
+    # Regex fast path before paying for an LLM call
+    fast = _fast_path_intent(message, entities)
+    if fast is not None:
+        return fast
+
     # LLM for ambiguous cases
+    llm_failed = False
     if llm is not None:
         try:
             from langchain_core.prompts import ChatPromptTemplate
@@ -172,24 +263,27 @@ Keys: "intent" (one of: policy, customer, both), "confidence" (0-1), "customer_n
             intent = (obj.get("intent") or "both").lower()
             if intent not in (INTENT_POLICY, INTENT_CUSTOMER, INTENT_BOTH):
                 intent = INTENT_BOTH
-            entities = _extract_entities(message)
             return IntentResult(
                 intent=intent,
                 confidence=float(obj.get("confidence", 0.8)),
-                customer_name=obj.get("customer_name") or _extract_customer_name_from_text(message),
+                customer_name=obj.get("customer_name") or name,
                 ticket_id=obj.get("ticket_id"),
                 entities=entities or None,
                 raw_json=content,
             )
         except Exception as e:
             logger.debug("LLM intent fallback failed: %s", e)
+            llm_failed = True
 
     # Default: both
-    entities = _extract_entities(message)
-    return IntentResult(
+    result = IntentResult(
         intent=INTENT_BOTH,
         confidence=0.5,
-        customer_name=_extract_customer_name_from_text(message),
+        customer_name=name,
         entities=entities or None,
         raw_json=json.dumps({"intent": "both", "confidence": 0.5}),
     )
+    if llm_failed:
+        # Don't pin the fallback for this message: the LLM may be back on the next call
+        raise _UncachedResult(result)
+    return result
@@ -0,0 +1,81 @@
+"""Known-customer-name lookup: Aho-Corasick automaton over support_tickets.customer_name (pyahocorasick, optional).
+One pass over the message finds any known name, including one-word and 3+-word names the regexes miss."""
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rebuild the automaton after this many seconds so newly seeded customers are picked up
+NAME_INDEX_TTL = 600
+
+_lock = threading.Lock()
+_automaton: Any = None
+_built_at = 0.0
+
+
+def build_name_automaton(db_path: Path | None = None):
+    """Automaton mapping lowercased customer names -> (length, stored name), or None if pyahocorasick or the DB is unavailable."""
+    try:
+        import ahocorasick
+    except ImportError:
+        return None
+    from src.db import sqlite_client
+
+    db_path = sqlite_client._resolve(db_path)
+    if not db_path.exists():
+        return None  # don't let the lookup create an empty DB file
+    rows = sqlite_client.run_query("SELECT DISTINCT customer_name FROM support_tickets", db_path)
+    if rows and "error" in rows[0]:
+        logger.debug("Name index not built: %s", rows[0]["error"])
+        return None
+    automaton = ahocorasick.Automaton()
+    for row in rows:
+        name = (row.get("customer_name") or "").strip()
+        if name:
+            key = name.lower()
+            automaton.add_word(key, (len(key), name))
+    if len(automaton) == 0:
+        return None
+    automaton.make_automaton()
+    return automaton
+
+
+def _get_automaton():
+    global _automaton, _built_at
+    with _lock:
+        if time.monotonic() - _built_at > NAME_INDEX_TTL:
+            try:
+                _automaton = build_name_automaton()
+            except Exception as e:
+                logger.debug("Name index build failed: %s", e)
+                _automaton = None
+            _built_at = time.monotonic()
+        return _automaton
+
+
+def reset_name_index() -> None:
+    """Force a rebuild on the next lookup."""
+    global _automaton, _built_at
+    with _lock:
+        _automaton, _built_at = None, 0.0
+
+
+def find_customer_name(text: str, automaton=None) -> Optional[str]:
+    """Longest known customer name occurring in text as whole words, else None."""
+    automaton = automaton if automaton is not None else _get_automaton()
+    if automaton is None:
+        return None
+    lower = text.lower()
+    best, best_len = None, 0
+    for end, (length, name) in automaton.iter(lower):
+        start = end - length + 1
+        if start > 0 and lower[start - 1].isalnum():
+            continue
+        if end + 1 < len(lower) and lower[end + 1].isalnum():
+            continue
+        if length > best_len:
+            best, best_len = name, length
+    return best
@@ -1,9 +1,10 @@
 """LangChain tools: SQL (query_customer_tickets) and Retriever (search_policy_documents)."""
+import functools
 import logging
+import re
+import time
 from typing import Any, Optional
 
-from langchain_core.tools import tool
-
 logger = logging.getLogger(__name__)
 
 
@@ -22,32 +23,158 @@ Guidelines:
 - Return ONLY the SQL SELECT, no explanation or markdown."""
 
 
+# Caps for the SQL tool: rows fetched from SQLite and characters of JSON handed back
+MAX_RESULT_ROWS = 200
+MAX_RESULT_CHARS = 8000
+
+
+def _with_row_limit(sql: str) -> str:
+    """Wrap a SELECT in an outer LIMIT MAX_RESULT_ROWS. The inner query sits on its own lines so a
+    trailing -- comment can't swallow the closing parenthesis; an inner LIMIT still applies as written."""
+    return f"SELECT * FROM (\n{sql.rstrip().rstrip(';').rstrip()}\n) LIMIT {MAX_RESULT_ROWS}"
+
+
+def _rows_json_prefix(rows: list[dict[str, Any]], cap: int) -> tuple[str, int]:
+    """(JSON array of the leading whole rows that fit in cap chars, number of rows in it)."""
+    from src.json_utils import dumps
+
+    buf, n = [], 2
+    for r in rows:
+        s = dumps(r)
+        if n + len(s) + 2 > cap:
+            break
+        buf.append(s)
+        n += len(s) + 2
+    if not buf and rows:
+        # A single row larger than the cap: truncate it rather than return nothing
+        return ("[" + dumps(rows[0]))[:cap], 0
+    return "[" + ", ".join(buf) + "]", len(buf)
+
+
+def _rows_to_json(rows: list[dict[str, Any]], cap: int = MAX_RESULT_CHARS) -> str:
+    """JSON array of whole rows, stopping before the output would exceed cap chars."""
+    return _rows_json_prefix(rows, cap)[0]
+
+
+def _truncation_note(shown: int, total: int) -> str:
+    """Line appended after a JSON result that lost rows, so the answer LLM knows the true count."""
+    return f"(showing {shown} of {total} rows; the rest were truncated)"
+
+
+_TRUNCATION_NOTE_RE = re.compile(r"\(showing \d+ of (\d+) rows; the rest were truncated\)")
+
+
+# Extracted entity -> WHERE condition for lookups built without the LLM
+_ENTITY_CONDITIONS = (
+    ("ticket_id", "ticket_id = ?", "{}"),
+    ("customer_email", "customer_email = ? COLLATE NOCASE", "{}"),
+    ("customer_name", "customer_name LIKE ?", "%{}%"),
+)
+# Entities that need the LLM to write the filter (product wording, status synonyms)
+_LLM_ONLY_ENTITIES = ("product_purchased", "ticket_status")
+# Only plain "everything about X" questions skip the LLM; counting, ordering or filtering wording needs real SQL
+_LOOKUP_RE = re.compile(
+    r"\b(overview|profile|summary|details?|history|info|information|show|look\s*up|tickets?\s+(for|of|from)|qualif\w*|eligib\w*)\b",
+    re.I,
+)
+_FILTER_RE = re.compile(
+    r"\b(how\s+many|count|number\s+of|total|average|avg|sum|most|least|max\w*|min\w*|latest|last|first|earliest"
+    r"|newest|oldest|recent\w*|top|highest|lowest|priority|date\w*|when|since|before|after|between|during|per|each"
+    r"|status|open|closed|pending|resolved|channel|type|rating|satisfaction|resolution|critical|urgent)\b",
+    re.I,
+)
+
+
+def _entity_query(question: str, entities: Optional[dict]) -> Optional[tuple[str, tuple]]:
+    """(parameterized SELECT, params) when the question is a plain lookup and the entities alone pin it down, else None.
+    Every present entity becomes a condition, ANDed, one bound parameter each."""
+    if not entities or any(entities.get(k) for k in _LLM_ONLY_ENTITIES):
+        return None
+    if not _LOOKUP_RE.search(question) or _FILTER_RE.search(question):
+        return None
+    conditions, params = [], []
+    for key, condition, pattern in _ENTITY_CONDITIONS:
+        value = entities.get(key)
+        if value:
+            conditions.append(condition)
+            params.append(pattern.format(value))
+    if not conditions:
+        return None
+    return f"SELECT * FROM support_tickets WHERE {' AND '.join(conditions)}", tuple(params)
+
+
+def _run_capped(sql: str, params: tuple, db_path=None) -> tuple[str, list[dict[str, Any]], Optional[int]]:
+    """Run sql under the MAX_RESULT_ROWS wrap: (executed SQL, rows, total matching rows when the cap was hit)."""
+    from src.db import sqlite_client
+
+    limited = _with_row_limit(sql)
+    rows = sqlite_client.run_parameterized(limited, params, db_path)
+    total = None
+    if len(rows) >= MAX_RESULT_ROWS:
+        counted = sqlite_client.run_parameterized(
+            f"SELECT COUNT(*) AS n FROM (\n{sql.rstrip().rstrip(';').rstrip()}\n)", params, db_path
+        )
+        if counted and "n" in counted[0]:
+            total = counted[0]["n"]
+    return limited, rows, total
+
+
+def _format_sql_result(sql: str, rows: list[dict[str, Any]], total: Optional[int] = None) -> str:
+    """Tool output: 'SQL: <sql>\nResult: <rows JSON | no data | error>', plus a truncation note line
+    when fewer than the total matching rows made it into the JSON."""
+    if rows and len(rows) == 1 and "error" in rows[0]:
+        return "SQL: " + sql + "\nResult: Query error: " + str(rows[0]["error"])
+    if not rows:
+        return "SQL: " + sql + "\nResult: No matching data found."
+    text, shown = _rows_json_prefix(rows, MAX_RESULT_CHARS)
+    total = max(total or 0, len(rows))
+    if shown < total:
+        text += "\n" + _truncation_note(shown, total)
+    return "SQL: " + sql + "\nResult: " + text
+
+
+@functools.lru_cache(maxsize=None)
+def _sql_prompt():
+    """SQL-generation prompt template, parsed once per process."""
+    from langchain_core.prompts import ChatPromptTemplate
+
+    return ChatPromptTemplate.from_messages([
+        ("system", SQL_SYSTEM_PROMPT),
+        ("human", "{question}"),
+    ])
+
+
+@functools.lru_cache(maxsize=None)
+def _default_llm():
+    """Shared ChatOllama for SQL tools created without an llm."""
+    from langchain_ollama import ChatOllama
+    from src.config import OLLAMA_BASE_URL, OLLAMA_MODEL
+
+    return ChatOllama(base_url=OLLAMA_BASE_URL, model=OLLAMA_MODEL, temperature=0)
+
+
 def create_sql_tool(llm=None, db_path=None):
     """Create SQL tool: NL -> SELECT -> execute -> result string.
     Use when user asks about customer, tickets, support history.
     """
+    from langchain_core.tools import tool
     from src.db import sqlite_client
 
     schema = sqlite_client.get_schema(db_path)
 
     @tool
-    def query_customer_tickets(question: str) -> str:
+    def query_customer_tickets(question: str, entities: Optional[dict] = None) -> str:
         """Use this when the user asks about a specific customer, support tickets, ticket history, customer profile, or any structured data about customers or tickets. Input: the user's question or a rewritten question focused on customer/ticket data."""
         if not question or not question.strip():
             return "Please provide a question about customers or support tickets."
         try:
-            if llm is None:
-                from langchain_ollama import ChatOllama
-                from src.config import OLLAMA_BASE_URL, OLLAMA_MODEL
-                _llm = ChatOllama(base_url=OLLAMA_BASE_URL, model=OLLAMA_MODEL, temperature=0)
-            else:
-                _llm = llm
-            from langchain_core.prompts import ChatPromptTemplate
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", SQL_SYSTEM_PROMPT),
-                ("human", "{question}"),
-            ])
-            chain = prompt | _llm
+            # Plain lookup of a known ticket id / email / name: bound parameters, no SQL generation round-trip
+            direct = _entity_query(question, entities)
+            if direct is not None:
+                sql, rows, total = _run_capped(*direct, db_path)
+                if rows and "error" not in rows[0]:
+                    return _format_sql_result(f"{sql}\n-- params: {list(direct[1])}", rows, total)
+            chain = _sql_prompt() | (llm if llm is not None else _default_llm())
             response = chain.invoke({"table_info": schema, "question": question})
             sql = response.content if hasattr(response, "content") else str(response)
             sql = sql.strip()
@@ -56,16 +183,9 @@ def create_sql_tool(llm=None, db_path=None):
                     if "select" in part.lower():
                         sql = part.strip()
                         break
-            if not sql.upper().startswith("SELECT"):
+            if not sqlite_client.is_select(sql):
                 return "Generated query was not a SELECT. Please ask about customer or ticket data."
-            rows = sqlite_client.run_query(sql, db_path)
-            if rows and len(rows) == 1 and "error" in rows[0]:
-                return "SQL: " + sql + "\nResult: Query error: " + str(rows[0]["error"])
-            if not rows:
-                return "SQL: " + sql + "\nResult: No matching data found."
-            import json
-            result_str = json.dumps(rows, default=str)[:8000]
-            return "SQL: " + sql + "\nResult: " + result_str
+            return _format_sql_result(*_run_capped(sql, (), db_path))
         except Exception as e:
             logger.exception("SQL tool error")
             return f"Error: {str(e)}"
@@ -73,11 +193,29 @@ def create_sql_tool(llm=None, db_path=None):
     return query_customer_tickets
 
 
+# Policy search results are reused for this long (seconds) per normalized query
+POLICY_CACHE_TTL = 300
+_NON_WORD_RE = re.compile(r"\W+")
+
+
+def _normalize_query(query: str) -> str:
+    """Lowercase and collapse punctuation/whitespace so paraphrase-level variants share a cache entry."""
+    return _NON_WORD_RE.sub(" ", query.lower()).strip()
+
+
+@functools.lru_cache(maxsize=256)
+def _cached_policy_search(norm_query: str, chroma_path, ttl_bucket: int) -> str:
+    """Policy search memoized on (normalized query, store, TTL window)."""
+    from src.db import vector_store
+
+    return vector_store.search(norm_query, k=3, chroma_path=chroma_path)
+
+
 def create_retriever_tool(chroma_path=None):
     """Create retriever tool: query -> embed -> Chroma search -> concatenated chunks.
     Use when user asks about policy, refund, terms.
     """
-    from src.db import vector_store
+    from langchain_core.tools import tool
 
     @tool
     def search_policy_documents(query: str) -> str:
@@ -85,7 +223,8 @@ def create_retriever_tool(chroma_path=None):
         if not query or not query.strip():
             return "Please provide a question about policy or documents."
         try:
-            text = vector_store.search(query, k=3, chroma_path=chroma_path)
+            ttl_bucket = int(time.time() // POLICY_CACHE_TTL)
+            text = _cached_policy_search(_normalize_query(query), chroma_path, ttl_bucket)
             return text if text else "No relevant policy documents found."
         except Exception as e:
             logger.exception("Retriever tool error")
@@ -17,6 +17,13 @@ OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:3b")
 
 _db_path = os.getenv("DB_PATH", "data/customer_support.db")
 _chroma_path = os.getenv("CHROMA_PATH", "data/chroma_policies")
+_onnx_model_path = os.getenv("ONNX_MODEL_PATH", "data/onnx_minilm_int8")
+
+# Opt-in INT8 ONNX embeddings: needs optimum/onnxruntime and a model built by scripts/build_onnx_embedder.py
+EMBEDDING_ONNX = os.getenv("EMBEDDING_ONNX", "0") == "1"
 
 DB_PATH = Path(_db_path) if os.path.isabs(_db_path) else PROJECT_ROOT / _db_path
 CHROMA_PATH = Path(_chroma_path) if os.path.isabs(_chroma_path) else PROJECT_ROOT / _chroma_path
+ONNX_MODEL_PATH = Path(_onnx_model_path) if os.path.isabs(_onnx_model_path) else PROJECT_ROOT / _onnx_model_path
+# Extracted policy-PDF text, keyed by file hash, so re-ingestion skips PDF parsing
+PDF_CACHE_PATH = PROJECT_ROOT / "data" / ".pdf_cache"
@@ -0,0 +1,38 @@
+"""Top-1 cosine similarity for the semantic cache. Numba-JIT kernel when numba is installed, else NumPy."""
+import numpy as np
+
+# Below this many cached rows a fused JIT loop beats BLAS dispatch overhead
+JIT_MAX_ROWS = 32
+
+
+def _top1_cos_numpy(mat, q) -> tuple[int, float]:
+    sims = mat @ q
+    i = int(sims.argmax())
+    return i, float(sims[i])
+
+
+try:
+    from numba import njit
+
+    @njit(cache=True, fastmath=True, boundscheck=False)
+    def _top1_cos_jit(mat, q):
+        # mat: (N, dim) float32, q: (dim,) float32, both L2-normalized
+        best, idx = -1.0, -1
+        dim = q.shape[0]
+        for i in range(mat.shape[0]):
+            s = 0.0
+            for j in range(dim):
+                s += mat[i, j] * q[j]
+            if s > best:
+                best, idx = s, i
+        return idx, best
+except ImportError:
+    _top1_cos_jit = None
+
+
+def top1_cos(mat, q) -> tuple[int, float]:
+    """(row index, cosine) of the row of mat most similar to q; rows and q must be L2-normalized."""
+    if _top1_cos_jit is not None and mat.shape[0] < JIT_MAX_ROWS:
+        idx, best = _top1_cos_jit(mat, np.asarray(q, dtype=np.float32))
+        return int(idx), float(best)
+    return _top1_cos_numpy(mat, q)
@@ -0,0 +1,72 @@
+"""INT8-quantized ONNX all-MiniLM-L6-v2 (optimum + onnxruntime). Optional: vector_store falls back to sentence-transformers."""
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+QUANTIZED_FILE = "model_quantized.onnx"
+
+
+def build_quantized_model(model_dir: Path) -> None:
+    """Export the model to ONNX and apply dynamic INT8 quantization into model_dir (one-time)."""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    model_dir.mkdir(parents=True, exist_ok=True)
+    model = ORTModelForFeatureExtraction.from_pretrained(MODEL_ID, export=True)
+    model.save_pretrained(model_dir)
+    AutoTokenizer.from_pretrained(MODEL_ID).save_pretrained(model_dir)
+    quantizer = ORTQuantizer.from_pretrained(model)
+    quantizer.quantize(
+        save_dir=model_dir,
+        quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False),
+    )
+    logger.info("Saved INT8 ONNX embedding model to %s", model_dir)
+
+
+class OnnxEmbedder:
+    """Tokenizer + INT8 ORT session + mean pooling. encode() mirrors SentenceTransformer.encode."""
+
+    def __init__(self, model_dir: Path, max_length: int = 256):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(model_dir, file_name=QUANTIZED_FILE)
+        self.max_length = max_length
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, show_progress_bar: bool = False):
+        """Return an (N, dim) float32 np.ndarray. convert_to_numpy/show_progress_bar are accepted for API parity."""
+        import numpy as np
+
+        batches = []
+        for i in range(0, len(texts), batch_size):
+            enc = self.tokenizer(
+                list(texts[i:i + batch_size]),
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            hidden = np.asarray(self.model(**enc).last_hidden_state)
+            # Mean pooling over real tokens (same as the sentence-transformers pooling layer)
+            mask = enc["attention_mask"][..., None].astype(np.float32)
+            batches.append((hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+        if not batches:
+            return np.zeros((0, self.model.config.hidden_size), dtype=np.float32)
+        embs = np.vstack(batches).astype(np.float32)
+        if normalize_embeddings:
+            embs /= np.clip(np.linalg.norm(embs, axis=1, keepdims=True), 1e-12, None)
+        return embs
+
+
+def load_onnx_embedder(model_dir: Path) -> OnnxEmbedder:
+    """Load the quantized model. It is never built here (that downloads and exports the model);
+    run scripts/build_onnx_embedder.py first."""
+    model_dir = Path(model_dir)
+    if not (model_dir / QUANTIZED_FILE).exists():
+        raise FileNotFoundError(f"{model_dir / QUANTIZED_FILE} not found; run scripts/build_onnx_embedder.py")
+    return OnnxEmbedder(model_dir)
@@ -1,67 +1,209 @@
 """SQLite client: connection, schema, read-only query."""
+import atexit
+import functools
 import logging
+import os
+import re
 import sqlite3
+import threading
+import weakref
 from pathlib import Path
 from typing import Any
 
 logger = logging.getLogger(__name__)
 
 
-def get_connection(db_path: Path | None = None) -> sqlite3.Connection:
-    """Return a connection to the SQLite DB."""
+class _ThreadConns:
+    """A thread's cached connections by db path. Held only by that thread's local storage, so when the
+    thread exits (e.g. a finished Streamlit script run) it is freed and its connections are closed."""
+    __slots__ = ("conns", "generation", "__weakref__")
+
+    def __init__(self, generation: int):
+        self.conns: dict[str, sqlite3.Connection] = {}
+        self.generation = generation
+
+
+# One long-lived read-only connection per (thread, db path)
+_conn_tls = threading.local()
+_thread_conns: "weakref.WeakSet[_ThreadConns]" = weakref.WeakSet()  # live threads' caches, for _close_connections
+_thread_conns_lock = threading.Lock()
+_conn_generation = 0  # bumped by _close_connections so every thread drops its stale handles
+
+_SELECT_RE = re.compile(r"^\s*(?:SELECT|WITH)\b", re.I)
+# Statement actions refused by the connection authorizer (defense in depth on top of query_only)
+_DENIED_ACTIONS = frozenset({
+    sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE,
+    sqlite3.SQLITE_CREATE_INDEX, sqlite3.SQLITE_CREATE_TABLE, sqlite3.SQLITE_CREATE_TEMP_INDEX,
+    sqlite3.SQLITE_CREATE_TEMP_TABLE, sqlite3.SQLITE_CREATE_TEMP_TRIGGER, sqlite3.SQLITE_CREATE_TEMP_VIEW,
+    sqlite3.SQLITE_CREATE_TRIGGER, sqlite3.SQLITE_CREATE_VIEW, sqlite3.SQLITE_CREATE_VTABLE,
+    sqlite3.SQLITE_DROP_INDEX, sqlite3.SQLITE_DROP_TABLE, sqlite3.SQLITE_DROP_TEMP_INDEX,
+    sqlite3.SQLITE_DROP_TEMP_TABLE, sqlite3.SQLITE_DROP_TEMP_TRIGGER, sqlite3.SQLITE_DROP_TEMP_VIEW,
+    sqlite3.SQLITE_DROP_TRIGGER, sqlite3.SQLITE_DROP_VIEW, sqlite3.SQLITE_DROP_VTABLE,
+    sqlite3.SQLITE_ALTER_TABLE, sqlite3.SQLITE_ATTACH, sqlite3.SQLITE_DETACH,
+    sqlite3.SQLITE_TRANSACTION, sqlite3.SQLITE_SAVEPOINT,
+})
+
+
+def _resolve(db_path: Path | None) -> Path:
     if db_path is None:
         from src.config import DB_PATH
         db_path = DB_PATH
-    db_path = Path(db_path)
+    return Path(db_path)
+
+
+def get_connection(db_path: Path | None = None) -> sqlite3.Connection:
+    """Return a new connection to the SQLite DB."""
+    db_path = _resolve(db_path)
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    return sqlite3.connect(str(db_path))
+    return sqlite3.connect(str(db_path), check_same_thread=False)
 
 
-def get_schema(db_path: Path | None = None) -> str:
-    """Return table schema with column names and usage hints for the agent."""
+def _connect(db_path: Path) -> sqlite3.Connection:
+    """Open and configure a query connection (WAL, bigger cache, read-only, Row factory)."""
     conn = get_connection(db_path)
     try:
-        cur = conn.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='support_tickets'"
-        )
-        if cur.fetchone() is None:
-            return "Table support_tickets not found."
-        cur = conn.execute("PRAGMA table_info(support_tickets)")
-        rows = cur.fetchall()
-        # row: (cid, name, type, notnull, default, pk)
-        cols = [row[1] for row in rows]
-        # Describe columns for search: which to use for name, email, product, etc.
-        return (
-            "Table: support_tickets\n"
-            "Columns (use these exact names): "
-            + ", ".join(cols)
-            + "\n\n"
-            "Search hints: "
-            "customer_name (text, use LIKE '%value%' for partial name); "
-            "customer_email (text, use = or LIKE for email); "
-            "product_purchased (text, use LIKE '%value%' for product); "
-            "ticket_id, ticket_status, ticket_priority, ticket_type, ticket_subject, ticket_description; "
-            "date_of_purchase, resolution, ticket_channel, customer_age, customer_gender, "
-            "first_response_time, time_to_resolution, customer_satisfaction_rating."
-        )
-    finally:
-        conn.close()
+        conn.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.Error:
+        pass  # read-only file/URI: keep the existing journal mode
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-20000")
+    conn.execute("PRAGMA query_only=ON")
+    conn.set_authorizer(_authorize)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _authorize(action, arg1, arg2, db_name, trigger) -> int:
+    # SQLite reports internal schema reads (e.g. for pragma_table_info) as UPDATEs of sqlite_master;
+    # real writes to it are still refused by query_only
+    if action == sqlite3.SQLITE_UPDATE and arg1 in ("sqlite_master", "sqlite_temp_master"):
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY if action in _DENIED_ACTIONS else sqlite3.SQLITE_OK
+
+
+def is_select(sql: str) -> bool:
+    """True for a single SELECT / WITH statement (one optional trailing semicolon)."""
+    return bool(_SELECT_RE.match(sql)) and ";" not in sql.rstrip().rstrip(";")
+
+
+def _get_conn(db_path: Path | None = None) -> sqlite3.Connection:
+    """Thread-local cached connection for db_path, opened on first use."""
+    db_path = _resolve(db_path)
+    cache = getattr(_conn_tls, "cache", None)
+    if cache is None or cache.generation != _conn_generation:
+        cache = _conn_tls.cache = _ThreadConns(_conn_generation)
+        with _thread_conns_lock:
+            _thread_conns.add(cache)
+    key = str(db_path)
+    conn = cache.conns.get(key)
+    if conn is None:
+        conn = cache.conns[key] = _connect(db_path)
+    return conn
+
+
+@atexit.register
+def _close_connections() -> None:
+    """Close every cached connection (all live threads) and forget them."""
+    global _conn_generation
+    with _thread_conns_lock:
+        for cache in list(_thread_conns):
+            for conn in cache.conns.values():
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            cache.conns.clear()
+        _thread_conns.clear()
+        _conn_generation += 1
+
+
+def _mtime(db_path: Path) -> str | None:
+    try:
+        return repr(os.stat(db_path).st_mtime)
+    except OSError:
+        return None
+
+
+def _schema_sidecar(db_path: Path) -> Path:
+    return db_path.with_suffix(".schema")
+
+
+def _read_schema_sidecar(db_path: Path, mtime: str) -> str | None:
+    """Schema text from the sidecar file if it was written for this DB mtime."""
+    try:
+        stamp, _, text = _schema_sidecar(db_path).read_text(encoding="utf-8").partition("\n")
+    except OSError:
+        return None
+    return text if stamp == mtime and text else None
+
+
+def _write_schema_sidecar(db_path: Path, mtime: str, text: str) -> None:
+    try:
+        _schema_sidecar(db_path).write_text(f"{mtime}\n{text}", encoding="utf-8")
+    except OSError:
+        logger.debug("Could not write schema cache for %s", db_path)
+
+
+@functools.lru_cache(maxsize=8)
+def get_schema(db_path: Path | None = None) -> str:
+    """Return table schema with column names and usage hints for the agent.
+    Memoized per db_path in-process and across processes via a <db>.schema sidecar keyed on the DB mtime.
+    """
+    db_path = _resolve(db_path)
+    mtime = _mtime(db_path)
+    if mtime is not None:
+        cached = _read_schema_sidecar(db_path, mtime)
+        if cached is not None:
+            return cached
+    schema = _build_schema(db_path)
+    # Stat again: opening the connection may touch the file (e.g. switching it to WAL)
+    mtime = _mtime(db_path)
+    if mtime is not None:
+        _write_schema_sidecar(db_path, mtime, schema)
+    return schema
+
+
+def _build_schema(db_path: Path) -> str:
+    conn = _get_conn(db_path)
+    cur = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='support_tickets'"
+    )
+    if cur.fetchone() is None:
+        return "Table support_tickets not found."
+    cur = conn.execute("PRAGMA table_info(support_tickets)")
+    rows = cur.fetchall()
+    # row: (cid, name, type, notnull, default, pk)
+    cols = [row[1] for row in rows]
+    # Describe columns for search: which to use for name, email, product, etc.
+    return (
+        "Table: support_tickets\n"
+        "Columns (use these exact names): "
+        + ", ".join(cols)
+        + "\n\n"
+        "Search hints: "
+        "customer_name (text, use LIKE '%value%' for partial name); "
+        "customer_email (text, use = or LIKE for email); "
+        "product_purchased (text, use LIKE '%value%' for product); "
+        "ticket_id, ticket_status, ticket_priority, ticket_type, ticket_subject, ticket_description; "
+        "date_of_purchase, resolution, ticket_channel, customer_age, customer_gender, "
+        "first_response_time, time_to_resolution, customer_satisfaction_rating."
+    )
 
 
 def run_query(sql: str, db_path: Path | None = None) -> list[dict[str, Any]]:
-    """Execute a read-only SELECT and return rows as list of dicts."""
-    sql_stripped = sql.strip().upper()
-    if not sql_stripped.startswith("SELECT"):
+    """Execute a single read-only SELECT (or WITH ... SELECT) and return rows as list of dicts."""
+    return run_parameterized(sql, (), db_path)
+
+
+def run_parameterized(sql: str, params: tuple | dict, db_path: Path | None = None) -> list[dict[str, Any]]:
+    """run_query with bound parameters (conn.execute(sql, params)) for SQL built in code."""
+    if not is_select(sql):
         logger.warning("Rejected non-SELECT query")
-        return [{"error": "Only SELECT queries are allowed."}]
-    conn = get_connection(db_path)
+        return [{"error": "Only a single SELECT/WITH query is allowed."}]
     try:
-        conn.row_factory = sqlite3.Row
-        cur = conn.execute(sql)
+        cur = _get_conn(db_path).execute(sql, params)
         rows = cur.fetchall()
         return [dict(row) for row in rows]
     except sqlite3.Error as e:
         logger.exception("SQL error")
         return [{"error": str(e)}]
-    finally:
-        conn.close()
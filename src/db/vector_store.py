@@ -1,26 +1,99 @@
 """Chroma vector store: ingest PDFs, similarity search. Uses sentence-transformers all-MiniLM-L6-v2."""
 import logging
+import os
+import threading
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 logger = logging.getLogger(__name__)
 
 # Lazy init
 _client = None
+_collection = None
 _embedding_fn = None
 
+# Semantic cache: recent query embeddings (ring buffer) -> search result, for paraphrased repeats
+SEM_CACHE_SIZE = 256
+SEM_CACHE_THRESHOLD = 0.92
+_sem_cache_lock = threading.Lock()
+_sem_cache_embs = None  # np.ndarray (SEM_CACHE_SIZE, dim), L2-normalized rows
+_sem_cache_vals: list = []  # (k, text), aligned with the filled rows of _sem_cache_embs
+_sem_cache_next = 0
+
 
 def _get_embedding_fn():
+    """INT8 ONNX embedder when available (EMBEDDING_ONNX), else FP32 sentence-transformers.
+    Both produce mean-pooled all-MiniLM-L6-v2 vectors; re-ingest after switching backends."""
     global _embedding_fn
     if _embedding_fn is None:
-        from sentence_transformers import SentenceTransformer
-        _embedding_fn = SentenceTransformer("all-MiniLM-L6-v2")
+        from src.config import EMBEDDING_ONNX, ONNX_MODEL_PATH
+        if EMBEDDING_ONNX:
+            try:
+                from src.db.onnx_embedder import load_onnx_embedder
+                _embedding_fn = load_onnx_embedder(ONNX_MODEL_PATH)
+            except Exception as e:
+                logger.info("ONNX embedder unavailable (%s); using sentence-transformers", e)
+        if _embedding_fn is None:
+            from sentence_transformers import SentenceTransformer
+            _embedding_fn = SentenceTransformer("all-MiniLM-L6-v2")
     return _embedding_fn
 
 
-def _embed(texts: List[str]) -> List[List[float]]:
+def _embed(texts: List[str]):
+    """Batch-encode texts to an (N, dim) float32 np.ndarray of L2-normalized rows."""
+    model = _get_embedding_fn()
+    return model.encode(
+        texts,
+        batch_size=64,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+
+
+def _embed_query(query: str):
+    """L2-normalized 1-D embedding (np.ndarray) for a single query."""
     model = _get_embedding_fn()
-    return model.encode(texts).tolist()
+    return model.encode([query], normalize_embeddings=True)[0]
+
+
+def _sem_cache_get(q, k: int) -> Optional[str]:
+    """Cached result of the most similar earlier query (cosine >= threshold, same k), else None."""
+    from src.db._cosine import top1_cos
+
+    with _sem_cache_lock:
+        n = len(_sem_cache_vals)
+        if n == 0:
+            return None
+        i, sim = top1_cos(_sem_cache_embs[:n], q)
+        if sim >= SEM_CACHE_THRESHOLD and _sem_cache_vals[i][0] == k:
+            return _sem_cache_vals[i][1]
+    return None
+
+
+def _sem_cache_put(q, k: int, text: str) -> None:
+    """Store a result, overwriting the oldest entry once the buffer is full."""
+    global _sem_cache_embs, _sem_cache_next
+    import numpy as np
+
+    with _sem_cache_lock:
+        if _sem_cache_embs is None:
+            _sem_cache_embs = np.zeros((SEM_CACHE_SIZE, q.shape[0]), dtype=np.float32)
+        i = _sem_cache_next
+        _sem_cache_embs[i] = q
+        if i < len(_sem_cache_vals):
+            _sem_cache_vals[i] = (k, text)
+        else:
+            _sem_cache_vals.append((k, text))
+        _sem_cache_next = (i + 1) % SEM_CACHE_SIZE
+
+
+def _sem_cache_clear() -> None:
+    global _sem_cache_embs, _sem_cache_next
+    with _sem_cache_lock:
+        _sem_cache_embs = None
+        _sem_cache_vals.clear()
+        _sem_cache_next = 0
 
 
 def get_client(chroma_path: Path | None = None):
@@ -35,44 +108,99 @@ def get_client(chroma_path: Path | None = None):
     return _client
 
 
-def ingest_pdfs(directory: Path | str, chroma_path: Path | None = None) -> None:
-    """Load PDFs from directory, chunk, embed, add to Chroma collection 'policy_docs'.
-    Uses sentence-transformers all-MiniLM-L6-v2 (same as search). Re-run clears and re-adds."""
-    from pypdf import PdfReader
+def _get_collection(chroma_path: Path | None = None):
+    """Cached 'policy_docs' collection handle, or None if it has not been ingested yet."""
+    global _collection
+    if _collection is None:
+        try:
+            _collection = get_client(chroma_path).get_collection(name="policy_docs")
+        except Exception:
+            return None
+    return _collection
+
+
+def _reset_collection() -> None:
+    """Drop the cached collection handle and the results cached from it; the next lookup refetches."""
+    global _collection
+    _collection = None
+    _sem_cache_clear()
+
+
+def _extract_pdf_text(pdf_path: Path) -> str:
+    """Full text of a PDF: PyMuPDF (fitz) when installed, it is several times faster; else pypdf."""
+    try:
+        import fitz
+    except ImportError:
+        from pypdf import PdfReader
+
+        reader = PdfReader(pdf_path)
+        return "".join(page.extract_text() or "" for page in reader.pages)
+    with fitz.open(pdf_path) as doc:
+        return "".join(page.get_text() for page in doc)
+
+
+def _cached_pdf_text(pdf_path: Path) -> str:
+    """PDF text, reused from data/.pdf_cache/<sha1 of the file>.txt when the same file was parsed before."""
+    import hashlib
+    from src.config import PDF_CACHE_PATH
+
+    cache = PDF_CACHE_PATH / f"{hashlib.sha1(pdf_path.read_bytes()).hexdigest()}.txt"
+    if cache.exists():
+        return cache.read_text(encoding="utf-8")
+    text = _extract_pdf_text(pdf_path)
+    try:
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        cache.write_text(text, encoding="utf-8")
+    except OSError as e:
+        logger.debug("Could not write PDF text cache %s: %s", cache, e)
+    return text
+
+
+def _parse_pdf(path_str: str) -> tuple[List[str], List[dict]]:
+    """Extract and chunk one PDF -> (chunks, metadatas). Module-level so ProcessPoolExecutor can pickle it."""
     from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+    pdf_path = Path(path_str)
+    try:
+        text = _cached_pdf_text(pdf_path)
+        splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50, separators=["\n\n", "\n", " "])
+        chunks = splitter.split_text(text)
+    except Exception as e:
+        logger.exception("Failed to ingest %s: %s", pdf_path, e)
+        return [], []
+    return chunks, [{"source": pdf_path.name}] * len(chunks)
+
+
+def ingest_pdfs(directory: Path | str, chroma_path: Path | None = None) -> None:
+    """Load PDFs from directory, chunk, embed, add to Chroma collection 'policy_docs'.
+    Uses sentence-transformers all-MiniLM-L6-v2 (same as search). Re-run clears and re-adds.
+    PDFs are parsed in parallel worker processes and embedded in one batch before the old collection is dropped."""
+    global _collection
     directory = Path(directory)
     if not directory.exists():
         logger.warning("Directory %s does not exist", directory)
         return
 
-    client = get_client(chroma_path)
-    try:
-        client.delete_collection(name="policy_docs")
-    except Exception:
-        pass
-    collection = client.get_or_create_collection(name="policy_docs", metadata={"description": "Policy PDF chunks"})
+    paths = list(directory.glob("*.pdf"))
+    if len(paths) > 1:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # spawn, not fork: this process may already hold Chroma's SQLite handles and threads
+        with ProcessPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1),
+                                 mp_context=multiprocessing.get_context("spawn")) as ex:
+            results = list(ex.map(_parse_pdf, map(str, paths)))
+    else:
+        # Not worth a process pool for a single PDF
+        results = [_parse_pdf(str(p)) for p in paths]
 
-    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50, separators=["\n\n", "\n", " "])
     all_ids = []
     all_docs = []
     all_metadatas = []
-
-    for pdf_path in directory.glob("*.pdf"):
-        try:
-            reader = PdfReader(pdf_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() or ""
-            chunks = splitter.split_text(text)
-            if not chunks:
-                continue
-            ids = [f"{pdf_path.stem}_{i}" for i in range(len(chunks))]
-            all_ids.extend(ids)
-            all_docs.extend(chunks)
-            all_metadatas.extend([{"source": pdf_path.name}] * len(chunks))
-        except Exception as e:
-            logger.exception("Failed to ingest %s: %s", pdf_path, e)
+    for pdf_path, (chunks, metadatas) in zip(paths, results):
+        all_ids.extend(f"{pdf_path.stem}_{i}" for i in range(len(chunks)))
+        all_docs.extend(chunks)
+        all_metadatas.extend(metadatas)
 
     if not all_docs:
         logger.warning("No chunks to add")
@@ -80,6 +208,15 @@ def ingest_pdfs(directory: Path | str, chroma_path: Path | None = None) -> None:
 
     embeddings = _embed(all_docs)
 
+    # Replace the collection only now: a failed parse/embed above leaves the existing index intact
+    client = get_client(chroma_path)
+    _sem_cache_clear()
+    try:
+        client.delete_collection(name="policy_docs")
+    except Exception:
+        pass
+    collection = _collection = client.get_or_create_collection(name="policy_docs", metadata={"description": "Policy PDF chunks"})
+
     # Chroma add in batches
     batch_size = 100
     for i in range(0, len(all_docs), batch_size):
@@ -94,29 +231,42 @@ def ingest_pdfs(directory: Path | str, chroma_path: Path | None = None) -> None:
 
 
 def search(query: str, k: int = 3, chroma_path: Path | None = None) -> str:
-    """Embed query, run similarity search, return concatenated chunk text. k=3 for lower latency."""
-    client = get_client(chroma_path)
-    try:
-        collection = client.get_collection(name="policy_docs")
-    except Exception:
+    """Embed query, run similarity search, return concatenated chunk text. k=3 for lower latency.
+    Near-duplicate queries (cosine >= SEM_CACHE_THRESHOLD) are answered from the semantic cache."""
+    q = _embed_query(query)
+    cached = _sem_cache_get(q, k)
+    if cached is not None:
+        return cached
+
+    collection = _get_collection(chroma_path)
+    if collection is None:
         return ""
 
-    query_embedding = _embed([query])
-    results = collection.query(query_embeddings=query_embedding, n_results=k)
+    try:
+        results = collection.query(query_embeddings=q.reshape(1, -1), n_results=k)
+    except Exception as e:
+        # Handle went stale, e.g. the collection was deleted and recreated by a re-ingest in another process
+        logger.info("Collection query failed (%s); refetching the collection once", e)
+        _reset_collection()
+        collection = _get_collection(chroma_path)
+        if collection is None:
+            return ""
+        results = collection.query(query_embeddings=q.reshape(1, -1), n_results=k)
     if not results or not results.get("documents"):
         return ""
     docs = results["documents"][0]
-    return "\n\n".join(docs) if docs else ""
+    text = "\n\n".join(docs) if docs else ""
+    _sem_cache_put(q, k, text)
+    return text
 
 
 def warmup(chroma_path: Path | None = None) -> None:
-    """Load embedding model and Chroma client so the first policy query is fast. Call at app startup."""
+    """Load embedding model and Chroma client so the first policy query is fast. Call at app startup.
+    Runs one dummy embed + similarity search so the HNSW index is loaded before the first real query."""
     try:
-        _get_embedding_fn()
-        client = get_client(chroma_path)
-        try:
-            client.get_collection(name="policy_docs")
-        except Exception:
-            pass
+        query_embedding = _embed_query("warmup")
+        collection = _get_collection(chroma_path)
+        if collection is not None:
+            collection.query(query_embeddings=query_embedding.reshape(1, -1), n_results=1)
     except Exception as e:
         logger.debug("Vector store warmup skipped or failed: %s", e)
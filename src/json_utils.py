@@ -0,0 +1,14 @@
+"""JSON encoding via orjson when installed (Rust, several times faster), else the stdlib json module.
+Both paths emit the same compact, non-ASCII-escaped (UTF-8) text."""
+try:
+    import orjson
+
+    def dumps(obj) -> str:
+        """Compact JSON string for obj; values JSON can't encode fall back to str()."""
+        return orjson.dumps(obj, default=str).decode()
+except ImportError:
+    import json
+
+    def dumps(obj) -> str:
+        """Compact JSON string for obj; values JSON can't encode fall back to str()."""
+        return json.dumps(obj, default=str, separators=(",", ":"), ensure_ascii=False)
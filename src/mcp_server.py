@@ -1,18 +1,37 @@
 """MCP server: exposes agent so UI or CLI can call it. Run with: python -m src.mcp_server."""
 import asyncio
-import json
 import sys
 from pathlib import Path
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
+from src.json_utils import dumps
+
+LLM_CACHE_PATH = PROJECT_ROOT / ".cache" / "llm.sqlite"
+
+
+def setup_llm_cache() -> None:
+    """Register a global LangChain LLM cache so repeat prompts skip Ollama.
+    Only sound for deterministic calls: every LLM in the agent runs at temperature=0."""
+    try:
+        from langchain_core.globals import set_llm_cache
+    except ImportError:
+        from langchain.globals import set_llm_cache
+    try:
+        from langchain_community.cache import SQLiteCache
+        LLM_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        set_llm_cache(SQLiteCache(database_path=str(LLM_CACHE_PATH)))
+    except ImportError:
+        from langchain_core.caches import InMemoryCache
+        set_llm_cache(InMemoryCache())
+
 
 def chat(message: str) -> str:
     """Single entry point: run agent and return JSON with answer and optional query details."""
     from src.agent.agent import invoke
     r = invoke(message)
-    return json.dumps({
+    return dumps({
         "answer": r.answer,
         "sql_query": r.sql_query,
         "sql_result": r.sql_result,
@@ -21,17 +40,37 @@ def chat(message: str) -> str:
     })
 
 
+def _error_response(e: Exception) -> str:
+    return dumps({"answer": f"Error: {e}", "sql_query": None, "sql_result": None, "retrieval_used": False, "retrieval_snippet": None})
+
+
+def _write_line(out: str) -> None:
+    """Write one response line as UTF-8 bytes, whatever encoding sys.stdout was configured with."""
+    stream = getattr(sys.stdout, "buffer", None)
+    if stream is None:  # stdout replaced by a text-only stream
+        sys.stdout.write(out + "\n")
+        sys.stdout.flush()
+        return
+    stream.write(out.encode("utf-8") + b"\n")
+    stream.flush()
+
+
 def main_sync():
-    """Read one line from stdin, call chat, print JSON to stdout."""
-    try:
-        line = sys.stdin.readline()
-        if not line:
-            return
-        msg = line.strip()
-        out = chat(msg)
-        print(out)
-    except Exception as e:
-        print(json.dumps({"answer": f"Error: {e}", "sql_query": None, "sql_result": None, "retrieval_used": False, "retrieval_snippet": None}))
+    """Serve newline-delimited messages from stdin until EOF: one JSON line out per line in.
+    The process stays up, so imports, model loads and DB connections are paid once."""
+    setup_llm_cache()
+    from src.agent.agent import warmup as warmup_agent
+    from src.db.vector_store import warmup as warmup_vector_store
+
+    warmup_vector_store()
+    warmup_agent()
+    for line in sys.stdin:
+        # Blank lines still get a reply (the agent's "please provide a question" answer)
+        try:
+            out = chat(line.strip())
+        except Exception as e:
+            out = _error_response(e)
+        _write_line(out)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,51 @@
+"""Shared fixtures: project DB location and a once-per-session schema string / token set."""
+import re
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# pyproject.toml sets pythonpath = "."; this only matters when pytest runs without that config
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import pytest
+from src.db import sqlite_client
+
+DB_PATH = ROOT / "data" / "customer_support.db"
+
+
+def pytest_addoption(parser):
+    parser.addoption("--runslow", action="store_true", default=False, help="also run tests marked slow")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: slow test, skipped unless --runslow is given")
+
+
+def pytest_collection_modifyitems(config, items):
+    # One existence check for the whole run: every test that needs the project DB uses db_exists
+    skip_no_db = None if DB_PATH.exists() else pytest.mark.skip(reason="DB not seeded")
+    skip_slow = None if config.getoption("--runslow") else pytest.mark.skip(reason="slow; use --runslow")
+    for item in items:
+        if skip_no_db and "db_exists" in getattr(item, "fixturenames", ()):
+            item.add_marker(skip_no_db)
+        if skip_slow and "slow" in item.keywords:
+            item.add_marker(skip_slow)
+
+
+@pytest.fixture(scope="session")
+def db_exists() -> Path:
+    """Path of the seeded project DB (tests using it are skipped at collection when it has not been seeded)."""
+    return DB_PATH
+
+
+@pytest.fixture(scope="session")
+def schema(db_exists) -> str:
+    """get_schema() of the project DB, computed once per test session."""
+    return sqlite_client.get_schema(db_exists)
+
+
+@pytest.fixture(scope="session")
+def schema_tokens(schema) -> frozenset[str]:
+    """Identifiers in the schema string, for set-membership checks."""
+    return frozenset(re.findall(r"\w+", schema))
@@ -1,9 +1,5 @@
 """Tests for agent response structure and routing (no live LLM/DB)."""
-import sys
-from pathlib import Path
-
-ROOT = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(ROOT))
+import json
 
 import pytest
 from src.agent.agent import AgentResponse, _parse_sql_tool_output
@@ -25,6 +21,11 @@ def test_parse_sql_tool_output_no_matching():
     assert "No matching data found" in (result or "")
 
 
+def test_parse_sql_tool_output_not_sql():
+    """Error output from the tool yields no SQL and no result."""
+    assert _parse_sql_tool_output("Error: connection refused") == (None, None)
+
+
 def test_agent_response_dataclass():
     """AgentResponse has required fields."""
     r = AgentResponse(
@@ -39,3 +40,111 @@ def test_agent_response_dataclass():
     assert r.answer == "Test answer"
     assert r.sql_query == "SELECT 1"
     assert r.nlp_details["intent"] == "customer"
+
+
+class _FakeTool:
+    def __init__(self, name, output):
+        self.name = name
+        self.output = output
+        self.calls = []
+
+    def invoke(self, args):
+        self.calls.append(args)
+        return self.output
+
+
+class _Chunk:
+    def __init__(self, content):
+        self.content = content
+
+
+class _FakeLLM:
+    def invoke(self, messages):
+        return _Chunk("Fake answer")
+
+    def stream(self, messages):
+        for token in ("Fake", " ", "answer"):
+            yield _Chunk(token)
+
+
+def test_invoke_both_runs_sql_and_retriever(monkeypatch):
+    """Both-intent queries call both tools and merge their results."""
+    from src.agent import agent
+
+    sql_tool = _FakeTool("query_customer_tickets", "SQL: SELECT 1\nResult: [{\"customer_name\": \"Denise Lee\"}]")
+    retriever_tool = _FakeTool("search_policy_documents", "Refunds within 30 days.")
+    tools = [sql_tool, retriever_tool]
+    monkeypatch.setattr(agent, "get_agent", lambda: (_FakeLLM(), tools, {t.name: t for t in tools}))
+
+    r = agent.invoke("Does Denise Lee qualify under the refund policy?")
+    assert r.answer == "Fake answer"
+    assert r.sql_query == "SELECT 1"
+    assert r.retrieval_used and r.retrieval_snippet == "Refunds within 30 days."
+    assert len(sql_tool.calls) == 1 and len(retriever_tool.calls) == 1
+
+
+def test_bound_sql_context_keeps_first_rows():
+    """Large JSON SQL results are cut to the first rows and a length cap before reaching the LLM."""
+    from src.agent.agent import MAX_SQL_CONTEXT, MAX_SQL_CONTEXT_ROWS, _bound_sql_context
+
+    rows = [{"ticket_id": i, "customer_name": "Denise Lee"} for i in range(100)]
+    bounded = _bound_sql_context(json.dumps(rows))
+    assert len(bounded) <= MAX_SQL_CONTEXT
+    text, note = bounded.split("\n")
+    assert json.loads(text) == rows[:MAX_SQL_CONTEXT_ROWS]
+    assert note == f"(showing {MAX_SQL_CONTEXT_ROWS} of 100 rows; the rest were truncated)"
+    assert json.loads(_bound_sql_context(json.dumps(rows[:3]))) == rows[:3]
+    assert _bound_sql_context("No matching data found.") == "No matching data found."
+
+
+def test_bound_sql_context_keeps_long_rows_whole():
+    """Rows too long to all fit are dropped whole, so the context stays valid JSON."""
+    from src.agent.agent import MAX_SQL_CONTEXT, _bound_sql_context
+
+    rows = [{"ticket_id": i, "ticket_description": "x" * 900} for i in range(10)]
+    bounded = _bound_sql_context(json.dumps(rows))
+    assert len(bounded) <= MAX_SQL_CONTEXT
+    text, note = bounded.split("\n")
+    kept = json.loads(text)
+    assert kept == rows[:len(kept)] and 0 < len(kept) < len(rows)
+    assert note == f"(showing {len(kept)} of 10 rows; the rest were truncated)"
+    capped = _bound_sql_context(json.dumps(rows[:2]) + "\n(showing 2 of 500 rows; the rest were truncated)")
+    assert capped.endswith("\n(showing 2 of 500 rows; the rest were truncated)")
+
+
+def test_invoke_stream_yields_growing_answer(monkeypatch):
+    """invoke_stream yields partial answers and ends with the full response."""
+    from src.agent import agent
+
+    retriever_tool = _FakeTool("search_policy_documents", "Refunds within 30 days.")
+    monkeypatch.setattr(agent, "get_agent", lambda: (_FakeLLM(), [retriever_tool], {retriever_tool.name: retriever_tool}))
+
+    answers = [r.answer for r in agent.invoke_stream("What is the current refund policy?")]
+    assert answers[0] == "Fake"
+    assert answers[-1] == "Fake answer"
+
+
+def test_warmup_ping_bypasses_llm_cache(monkeypatch):
+    """warmup() reaches the model even when a global LLM cache already holds the ping's answer."""
+    from langchain_core.caches import InMemoryCache
+    from langchain_core.globals import get_llm_cache, set_llm_cache
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from src.agent import agent
+
+    calls = []
+
+    class _CountingLLM(FakeListChatModel):
+        def _call(self, *args, **kwargs):
+            calls.append(1)
+            return super()._call(*args, **kwargs)
+
+    llm = _CountingLLM(responses=["ok"])
+    monkeypatch.setattr(agent, "get_agent", lambda: (llm, [], {}))
+    previous = get_llm_cache()
+    set_llm_cache(InMemoryCache())
+    try:
+        llm.invoke("ok")  # now cached
+        agent.warmup()
+        assert len(calls) == 2
+    finally:
+        set_llm_cache(previous)
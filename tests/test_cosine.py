@@ -0,0 +1,22 @@
+"""Parity of the numba top-1 cosine kernel with the NumPy path (skipped when numba is not installed)."""
+import numpy as np
+import pytest
+
+pytest.importorskip("numba")
+from src.db import _cosine
+
+
+@pytest.mark.parametrize("rows", [1, 5, _cosine.JIT_MAX_ROWS - 1])
+def test_jit_matches_numpy(rows):
+    """Same best row and cosine (to float32 precision) as _top1_cos_numpy."""
+    rng = np.random.default_rng(rows)
+    mat = rng.standard_normal((rows, 384)).astype(np.float32)
+    mat /= np.linalg.norm(mat, axis=1, keepdims=True)
+    q = mat[rows // 2] + 0.05 * rng.standard_normal(384).astype(np.float32)
+    q /= np.linalg.norm(q)
+
+    idx, best = _cosine._top1_cos_jit(mat, q)
+    np_idx, np_best = _cosine._top1_cos_numpy(mat, q)
+    assert int(idx) == np_idx
+    assert float(best) == pytest.approx(np_best, abs=1e-5)
+    assert _cosine.top1_cos(mat, q) == (np_idx, pytest.approx(np_best, abs=1e-5))
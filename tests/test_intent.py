@@ -1,10 +1,4 @@
 """Tests for intent classification and entity extraction."""
-import sys
-from pathlib import Path
-
-ROOT = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(ROOT))
-
 import pytest
 from src.agent.intent import (
     INTENT_BOTH,
@@ -49,3 +43,61 @@ def test_empty_message():
     r = classify_intent_and_entities("")
     assert r.intent == INTENT_BOTH
     assert r.confidence == 0.0
+
+
+def test_fast_path_skips_llm():
+    """Obvious policy phrasing is classified by regex; the LLM is never invoked."""
+    class _NoLLM:
+        def invoke(self, *args, **kwargs):
+            raise AssertionError("LLM should not be called")
+
+    r = classify_intent_and_entities("are warranty returns accepted?", llm=_NoLLM())
+    assert r.intent == INTENT_POLICY
+    assert r.confidence >= 0.9
+
+
+def test_email_word_without_address_is_not_fast_pathed():
+    """"email" only takes the customer fast path when an address was extracted; otherwise the LLM decides."""
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    llm = FakeListChatModel(responses=['{"intent": "policy", "confidence": 0.8}'])
+    r = classify_intent_and_entities("What is the support email?", llm=llm)
+    assert r.intent == INTENT_POLICY and r.confidence == 0.8  # the LLM's answer, not the fast path's
+
+
+@pytest.mark.parametrize("message", [
+    "Is customer Denise Lee eligible for a refund?",
+    "Is ticket #42 eligible for a return?",
+])
+def test_eligibility_for_customer_or_ticket_is_both(message):
+    """Eligibility questions about a customer or ticket need the SQL tool and the policy retriever."""
+    assert classify_intent_and_entities(message).intent == INTENT_BOTH
+
+
+def test_classification_is_memoized():
+    """Repeated messages (modulo surrounding/inner whitespace) reuse the cached result."""
+    r1 = classify_intent_and_entities("What is the current refund policy?")
+    r2 = classify_intent_and_entities("  What is the   current refund policy? ")
+    assert r1 is r2
+
+
+def test_llm_failure_is_not_memoized():
+    """A failed LLM call falls back to 'both' for that call only; the next call asks the LLM again."""
+    class _Resp:
+        content = '{"intent": "policy", "confidence": 0.8}'
+
+    class _FlakyLLM:
+        def __init__(self):
+            self.calls = 0
+
+        def __call__(self, prompt_value):  # piped after the prompt as a RunnableLambda
+            self.calls += 1
+            if self.calls == 1:
+                raise ConnectionError("Ollama down")
+            return _Resp()
+
+    llm = _FlakyLLM()
+    message = "hmm, what about that thing from last week"
+    assert classify_intent_and_entities(message, llm=llm).intent == INTENT_BOTH
+    assert classify_intent_and_entities(message, llm=llm).intent == INTENT_POLICY
+    assert llm.calls == 2
@@ -0,0 +1,43 @@
+"""Tests for the MCP server's stdin/stdout line protocol (no live LLM)."""
+import io
+import json
+import sys
+
+
+def test_write_line_to_text_only_stdout(monkeypatch):
+    """A stdout without .buffer (e.g. StringIO) gets the line as text."""
+    from src import mcp_server
+
+    out = io.StringIO()
+    monkeypatch.setattr(sys, "stdout", out)
+    mcp_server._write_line('{"answer":"a — b"}')
+    assert out.getvalue() == '{"answer":"a — b"}\n'
+
+
+def test_write_line_is_utf8_bytes_on_ascii_stdout(monkeypatch):
+    """Non-ASCII answers are written as UTF-8 even when stdout's text encoding is ASCII."""
+    from src import mcp_server
+
+    raw = io.BytesIO()
+    monkeypatch.setattr(sys, "stdout", io.TextIOWrapper(raw, encoding="ascii"))
+    mcp_server._write_line(mcp_server.dumps({"answer": "a — b"}))
+    assert json.loads(raw.getvalue().decode("utf-8")) == {"answer": "a — b"}
+
+
+def test_main_sync_answers_every_line_including_blank(monkeypatch):
+    """One JSON line out per line in: a blank message gets a reply instead of being skipped."""
+    from src import mcp_server
+    from src.agent import agent
+    from src.db import vector_store
+
+    monkeypatch.setattr(mcp_server, "setup_llm_cache", lambda: None)
+    monkeypatch.setattr(agent, "warmup", lambda: None)
+    monkeypatch.setattr(vector_store, "warmup", lambda: None)
+    monkeypatch.setattr(mcp_server, "chat", lambda msg: json.dumps({"answer": f"echo:{msg}"}))
+    monkeypatch.setattr(sys, "stdin", io.StringIO("hello\n\n"))
+    out = io.StringIO()
+    monkeypatch.setattr(sys, "stdout", out)
+
+    mcp_server.main_sync()
+    answers = [json.loads(line)["answer"] for line in out.getvalue().splitlines()]
+    assert answers == ["echo:hello", "echo:"]
@@ -0,0 +1,22 @@
+"""Tests for the known-customer-name Aho-Corasick index."""
+import pytest
+from src.agent.name_index import find_customer_name
+
+ahocorasick = pytest.importorskip("ahocorasick")
+
+
+def _automaton(*names):
+    a = ahocorasick.Automaton()
+    for name in names:
+        a.add_word(name.lower(), (len(name), name))
+    a.make_automaton()
+    return a
+
+
+def test_finds_longest_whole_word_name():
+    """Matches are case-insensitive, whole-word, and prefer the longest known name."""
+    a = _automaton("Ema", "Lee", "Denise Lee", "Mary Ann Smith")
+    assert find_customer_name("does denise lee qualify?", a) == "Denise Lee"
+    assert find_customer_name("tickets for Mary Ann Smith", a) == "Mary Ann Smith"
+    assert find_customer_name("Show Ema's tickets", a) == "Ema"
+    assert find_customer_name("what about Emanuel or Leeds?", a) is None
@@ -1,40 +1,131 @@
 """Tests for SQLite client schema (uses project DB if present)."""
-import sys
-from pathlib import Path
-
-ROOT = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(ROOT))
+import sqlite3
 
 import pytest
 from src.db import sqlite_client
 
-DB_PATH = ROOT / "data" / "customer_support.db"
 
+# The real opener, captured before the autouse fixture below swaps it for the immutable-URI one
+_real_connect = sqlite_client._connect
+
+
+def _db_uri(db_path) -> str:
+    return f"file:{db_path}?mode=ro&immutable=1"
+
+
+@pytest.fixture(autouse=True)
+def read_only_connections(monkeypatch):
+    """Open every query connection as a read-only, immutable URI (no locking/WAL; SQLite itself refuses writes)."""
+    def _connect(db_path):
+        conn = sqlite3.connect(_db_uri(db_path), uri=True, check_same_thread=False)
+        conn.set_authorizer(sqlite_client._authorize)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    sqlite_client._close_connections()
+    monkeypatch.setattr(sqlite_client, "_connect", _connect)
+    yield
+    sqlite_client._close_connections()
 
-@pytest.mark.skipif(not DB_PATH.exists(), reason="DB not seeded")
-def test_get_schema_returns_table_and_columns():
+
+def test_columns_present(db_exists):
+    """support_tickets has the columns the agent searches on (reads only that table's column list)."""
+    rows = sqlite_client.run_query("SELECT name FROM pragma_table_info('support_tickets')", db_exists)
+    names = {r["name"] for r in rows}
+    assert {"ticket_id", "customer_name", "customer_email", "product_purchased", "ticket_status"} <= names
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("name", ["support_tickets", "customer_name", "ticket_id", "customer_email", "product_purchased", "ticket_status"])
+def test_get_schema_returns_table_and_columns(schema_tokens, name):
     """Schema string includes support_tickets and column names."""
-    schema = sqlite_client.get_schema(DB_PATH)
-    assert "support_tickets" in schema
-    assert "customer_name" in schema
-    assert "ticket_id" in schema
-    assert "customer_email" in schema
-    assert "product_purchased" in schema
-    assert "ticket_status" in schema
+    assert name in schema_tokens
 
 
-@pytest.mark.skipif(not DB_PATH.exists(), reason="DB not seeded")
-def test_run_query_select_only():
+def test_run_query_select_only(db_exists):
     """Only SELECT is allowed."""
-    rows = sqlite_client.run_query("INSERT INTO support_tickets (ticket_id) VALUES (1)", DB_PATH)
+    rows = sqlite_client.run_query("INSERT INTO support_tickets (ticket_id) VALUES (1)", db_exists)
     assert len(rows) == 1 and "error" in rows[0]
+    # Below the app's check, the driver-level read-only open rejects the write too
+    conn = sqlite3.connect(_db_uri(db_exists), uri=True)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO support_tickets (ticket_id) VALUES (1)")
+    finally:
+        conn.close()
 
 
-@pytest.mark.skipif(not DB_PATH.exists(), reason="DB not seeded")
-def test_run_query_valid_select():
+def test_run_query_valid_select(db_exists):
     """Valid SELECT returns list of dicts."""
-    rows = sqlite_client.run_query("SELECT ticket_id, customer_name FROM support_tickets LIMIT 1", DB_PATH)
+    rows = sqlite_client.run_query("SELECT ticket_id, customer_name FROM support_tickets LIMIT 1", db_exists)
     assert isinstance(rows, list)
     if rows and "error" not in (rows[0] or {}):
         assert isinstance(rows[0], dict)
         assert "ticket_id" in rows[0] or "customer_name" in rows[0]
+
+
+def test_cached_connection_is_reused_and_read_only(db_exists):
+    """Queries share one connection per thread, and that connection refuses writes."""
+    conn = sqlite_client._get_conn(db_exists)
+    assert sqlite_client._get_conn(db_exists) is conn
+    # Refused by the authorizer ("not authorized"), with the read-only URI open behind it
+    with pytest.raises(sqlite3.DatabaseError):
+        conn.execute("DELETE FROM support_tickets")
+
+
+def test_real_connect_sets_query_only_and_authorizer(db_exists, tmp_path):
+    """The production _connect (bypassing the fixture) on a writable copy: query_only is on and writes are refused."""
+    import shutil
+
+    db = tmp_path / "copy.db"
+    shutil.copy(db_exists, db)
+    conn = _real_connect(db)
+    try:
+        assert conn.execute("PRAGMA query_only").fetchone()[0] == 1
+        assert conn.row_factory is sqlite3.Row
+        with pytest.raises(sqlite3.DatabaseError, match="not authorized"):
+            conn.execute("DELETE FROM support_tickets")
+        # With the authorizer removed, query_only still refuses the write
+        conn.set_authorizer(None)
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            conn.execute("DELETE FROM support_tickets")
+    finally:
+        conn.close()
+
+
+def test_is_select_allows_single_select_or_with():
+    """Single SELECT / WITH statements pass; writes and stacked statements do not."""
+    assert sqlite_client.is_select("select * from support_tickets;")
+    assert sqlite_client.is_select("  WITH t AS (SELECT 1) SELECT * FROM t")
+    assert not sqlite_client.is_select("SELECT 1; DROP TABLE support_tickets")
+    assert not sqlite_client.is_select("DELETE FROM support_tickets")
+    assert not sqlite_client.is_select("SELECTED")
+
+
+def test_schema_sidecar_reused_until_db_changes(tmp_path):
+    """get_schema writes a <db>.schema sidecar and serves it while the DB mtime is unchanged."""
+    db = tmp_path / "t.db"
+    with sqlite3.connect(db) as conn:
+        conn.execute("CREATE TABLE support_tickets (ticket_id INTEGER, customer_name TEXT)")
+    schema = sqlite_client.get_schema(db)
+    sidecar = db.with_suffix(".schema")
+    assert "customer_name" in schema and sidecar.exists()
+
+    stamp = sidecar.read_text(encoding="utf-8").partition("\n")[0]
+    sidecar.write_text(f"{stamp}\nfrom sidecar", encoding="utf-8")
+    sqlite_client.get_schema.cache_clear()
+    assert sqlite_client.get_schema(db) == "from sidecar"
+    sqlite_client._close_connections()
+
+
+def test_thread_connections_closed_when_thread_exits(tmp_path):
+    """Short-lived threads (one per Streamlit rerun) don't leave cached connections behind."""
+    import threading
+
+    db = tmp_path / "t.db"
+    sqlite3.connect(db).close()
+    threads = [threading.Thread(target=sqlite_client.run_query, args=("SELECT 1", db)) for _ in range(5)]
+    for t in threads:
+        t.start()
+        t.join()
+    assert len(sqlite_client._thread_conns) == 0
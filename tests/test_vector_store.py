@@ -0,0 +1,127 @@
+"""Tests for vector_store.search around the collection handle and semantic cache (no Chroma or embedding model)."""
+import numpy as np
+import pytest
+from src.db import vector_store
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    """Empty semantic cache and no cached collection handle for every test."""
+    monkeypatch.setattr(vector_store, "_collection", None)
+    vector_store._sem_cache_clear()
+    yield
+    vector_store._sem_cache_clear()
+
+
+def _unit(*xs):
+    v = np.asarray(xs, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+class _Collection:
+    def __init__(self, docs=("Refunds within 30 days.",), fail=False):
+        self.docs, self.fail, self.calls = list(docs), fail, 0
+
+    def query(self, query_embeddings, n_results):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("collection does not exist")
+        return {"documents": [self.docs[:n_results]]}
+
+
+class _Client:
+    def __init__(self, *collections):
+        self.collections = list(collections)
+
+    def get_collection(self, name):
+        return self.collections.pop(0)
+
+
+def test_search_refetches_stale_collection_once(monkeypatch):
+    """A query error on the cached handle (e.g. after an external re-ingest) refetches the collection and retries once."""
+    stale, fresh = _Collection(fail=True), _Collection(docs=["New policy text."])
+    monkeypatch.setattr(vector_store, "_embed_query", lambda q: _unit(1, 0, 0))
+    client = _Client(stale, fresh)
+    monkeypatch.setattr(vector_store, "get_client", lambda chroma_path=None: client)
+
+    assert vector_store.search("refund policy", k=1) == "New policy text."
+    assert stale.calls == 1 and fresh.calls == 1
+    assert vector_store._collection is fresh
+
+
+def test_search_raises_when_retry_also_fails(monkeypatch):
+    """Only one retry: a second failure propagates to the caller."""
+    monkeypatch.setattr(vector_store, "_embed_query", lambda q: _unit(1, 0, 0))
+    client = _Client(_Collection(fail=True), _Collection(fail=True))
+    monkeypatch.setattr(vector_store, "get_client", lambda chroma_path=None: client)
+
+    with pytest.raises(RuntimeError):
+        vector_store.search("refund policy", k=1)
+
+
+@pytest.fixture
+def search_env(monkeypatch):
+    """search() over fixed query vectors and one counting collection."""
+    vectors = {
+        "refund policy": _unit(1, 0, 0),
+        "policy on refunds": _unit(1, 0.1, 0),  # cosine ~0.995 with "refund policy"
+        "shipping times": _unit(0, 1, 0),
+    }
+    collection = _Collection()
+    monkeypatch.setattr(vector_store, "_embed_query", lambda q: vectors[q])
+    monkeypatch.setattr(vector_store, "_get_collection", lambda chroma_path=None: collection)
+    return collection
+
+
+def test_sem_cache_hit_above_threshold(search_env):
+    """A paraphrase above SEM_CACHE_THRESHOLD is answered from the cache without querying Chroma."""
+    first = vector_store.search("refund policy", k=1)
+    assert vector_store.search("policy on refunds", k=1) == first
+    assert search_env.calls == 1
+
+
+def test_sem_cache_miss_below_threshold(search_env):
+    """A dissimilar query goes to Chroma."""
+    vector_store.search("refund policy", k=1)
+    vector_store.search("shipping times", k=1)
+    assert search_env.calls == 2
+
+
+def test_sem_cache_miss_on_k_mismatch(search_env):
+    """The same query with a different k is not served from the cache."""
+    vector_store.search("refund policy", k=1)
+    vector_store.search("refund policy", k=3)
+    assert search_env.calls == 2
+
+
+def test_sem_cache_ring_buffer_overwrites_oldest(monkeypatch):
+    """Once SEM_CACHE_SIZE entries are stored, the next put replaces the oldest one."""
+    monkeypatch.setattr(vector_store, "SEM_CACHE_SIZE", 4)
+    basis = np.eye(5, dtype=np.float32)
+    for i in range(5):
+        vector_store._sem_cache_put(basis[i], 3, f"doc {i}")
+    assert len(vector_store._sem_cache_vals) == 4
+    assert vector_store._sem_cache_get(basis[0], 3) is None
+    assert vector_store._sem_cache_get(basis[4], 3) == "doc 4"
+    assert vector_store._sem_cache_get(basis[1], 3) == "doc 1"
+
+
+def test_sem_cache_cleared_on_ingest(monkeypatch, tmp_path):
+    """Re-ingesting drops cached results, so answers from the old index are not served."""
+    (tmp_path / "policy.pdf").write_bytes(b"")
+    vector_store._sem_cache_put(_unit(1, 0, 0), 3, "old policy text")
+
+    class _IngestClient:
+        def delete_collection(self, name):
+            pass
+
+        def get_or_create_collection(self, name, metadata=None):
+            return type("C", (), {"add": lambda self, **kw: None})()
+
+    monkeypatch.setattr(vector_store, "_parse_pdf", lambda path: (["new chunk"], [{"source": "policy.pdf"}]))
+    monkeypatch.setattr(vector_store, "_embed", lambda texts: np.zeros((len(texts), 3), dtype=np.float32))
+    monkeypatch.setattr(vector_store, "get_client", lambda chroma_path=None: _IngestClient())
+
+    vector_store.ingest_pdfs(tmp_path)
+    assert vector_store._sem_cache_get(_unit(1, 0, 0), 3) is None
+    assert vector_store._sem_cache_vals == []